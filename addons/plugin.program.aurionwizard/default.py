@@ -6,9 +6,13 @@ import xbmcaddon
 import xbmcgui
 import xbmcplugin
 import xbmcvfs
+import hashlib
+import io
 import json
 import sys
 import os
+import urllib.request
+import zipfile
 
 ADDON            = xbmcaddon.Addon()
 ADDON_ID         = ADDON.getAddonInfo('id')
@@ -20,6 +24,9 @@ AURION_REPO_ID   = "repository.aurion"
 AURION_VIDEO_ID  = "plugin.video.aurion"
 AURION_SKIN_ID   = "skin.aurion"
 AURION_SKIN_NAME = "skin.aurion"  # Kodi setting value for look&feel skin
+REPO_ZIPS_URL    = "https://outrageousbean.github.io/Aurion/zips/"
+# Written into the skin folder by other add-ons (script.skinshortcuts), never by a release
+GENERATED_FILES  = ("script-skinshortcuts-includes.xml",)
 
 
 def log(message, level=xbmc.LOGDEBUG):
@@ -125,8 +132,181 @@ def do_setup():
         xbmcgui.Dialog().notification("Aurion Wizard", "Some items failed to install", xbmcgui.NOTIFICATION_ERROR, 4000)
 
 
+def fetch(url, timeout=30):
+    """Download a URL into memory."""
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return resp.read()
+
+
+def sha256_file(path):
+    """Hash a local file, or return None if it does not exist."""
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def safe_join(root, rel):
+    """Join an archive path onto root, refusing anything that escapes it."""
+    root = os.path.normpath(root)
+    path = os.path.normpath(os.path.join(root, rel))
+    if os.path.commonpath([root, path]) != root:
+        raise ValueError(f"Unsafe path in update: {rel}")
+    return path
+
+
+def replace_files(addon_path, files):
+    """Stage {rel_path: bytes} next to their targets, then move them all into place."""
+    staged = []
+    try:
+        for rel, data in files.items():
+            target = safe_join(addon_path, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target + '.aurion-new', 'wb') as f:
+                f.write(data)
+            staged.append(target)
+    except Exception:
+        for target in staged:
+            os.remove(target + '.aurion-new')
+        raise
+    for target in staged:
+        os.replace(target + '.aurion-new', target)
+
+
+def apply_delta(addon_path, bundle, installed, latest):
+    """Patch an installed add-on in place from a verified delta bundle."""
+    with zipfile.ZipFile(io.BytesIO(bundle)) as zf:
+        delta = json.loads(zf.read('delta.json'))
+        if delta['from'] != installed or delta['to'] != latest:
+            raise ValueError(f"Delta is {delta['from']} -> {delta['to']}, not {installed} -> {latest}")
+
+        # The local tree must match the release the delta was built against
+        for rel, (old, _new) in delta['changed'].items():
+            if sha256_file(safe_join(addon_path, rel)) != old:
+                raise ValueError(f"Local file differs from release {installed}: {rel}")
+        for rel, old in delta['removed'].items():
+            if sha256_file(safe_join(addon_path, rel)) not in (None, old):
+                raise ValueError(f"Local file differs from release {installed}: {rel}")
+
+        files = {}
+        for rel, (_old, new) in delta['changed'].items():
+            data = zf.read('files/' + rel)
+            if hashlib.sha256(data).hexdigest() != new:
+                raise ValueError(f"Hash mismatch in delta for {rel}")
+            files[rel] = data
+
+    replace_files(addon_path, files)
+    for rel in delta['removed']:
+        path = safe_join(addon_path, rel)
+        if os.path.isfile(path):
+            os.remove(path)
+    log(f"Applied delta {installed} -> {latest}: {len(files)} changed, {len(delta['removed'])} removed", xbmc.LOGINFO)
+
+
+def remove_stale_files(addon_path, old_files, new_files):
+    """
+    Delete the files the old release shipped and the new one doesn't, then
+    any folders that leaves empty. Files nobody released (such as
+    GENERATED_FILES) are never touched.
+    """
+    removed = 0
+    for rel in sorted(set(old_files) - set(new_files)):
+        if os.path.basename(rel) in GENERATED_FILES:
+            continue
+        path = safe_join(addon_path, rel)
+        if os.path.isfile(path):
+            os.remove(path)
+            removed += 1
+            folder = os.path.dirname(path)
+            while folder != os.path.normpath(addon_path) and not os.listdir(folder):
+                os.rmdir(folder)
+                folder = os.path.dirname(folder)
+    return removed
+
+
+def apply_full_zip(addon_id, addon_path, index, installed):
+    """
+    Install a verified full release zip over an add-on in place. Files the
+    installed release shipped and the new one doesn't are deleted, going
+    by the installed release's published file list; without that list
+    nothing is deleted.
+    """
+    data = fetch(f"{REPO_ZIPS_URL}{addon_id}/{index['zip']}")
+    if hashlib.sha256(data).hexdigest() != index['sha256']:
+        raise ValueError(f"Hash mismatch in {index['zip']}")
+    prefix = addon_id + '/'
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        # ZipFile.read checks each member's CRC
+        files = {
+            info.filename[len(prefix):]: zf.read(info)
+            for info in zf.infolist()
+            if not info.is_dir() and info.filename.startswith(prefix)
+        }
+    replace_files(addon_path, files)
+    try:
+        old_files = json.loads(fetch(f"{REPO_ZIPS_URL}{addon_id}/{addon_id}-{installed}.files.json"))['files']
+    except Exception as e:
+        log(f"No file list for {addon_id} {installed}, keeping files it may have dropped: {e}", xbmc.LOGWARNING)
+        old_files = {}
+    removed = remove_stale_files(addon_path, old_files, files)
+    log(f"Installed {index['zip']} in place, {removed} stale files removed", xbmc.LOGINFO)
+
+
+def delta_update(addon_id):
+    """
+    Bring an installed add-on up to the latest published release using a
+    delta bundle, or the full zip when no delta covers the installed
+    version or verification fails. Returns the new version, or None.
+    """
+    addon = xbmcaddon.Addon(addon_id)
+    installed = addon.getAddonInfo('version')
+    addon_path = xbmcvfs.translatePath(addon.getAddonInfo('path'))
+    try:
+        index = json.loads(fetch(f"{REPO_ZIPS_URL}{addon_id}/deltas.json"))
+    except Exception as e:
+        log(f"No delta index for {addon_id}: {e}", xbmc.LOGWARNING)
+        return None
+    latest = index['version']
+    if latest == installed:
+        return None
+
+    entry = index['deltas'].get(installed)
+    if entry:
+        try:
+            bundle = fetch(f"{REPO_ZIPS_URL}{addon_id}/{entry['file']}")
+            if hashlib.sha256(bundle).hexdigest() != entry['sha256']:
+                raise ValueError(f"Hash mismatch in {entry['file']}")
+            apply_delta(addon_path, bundle, installed, latest)
+            return latest
+        except Exception as e:
+            log(f"Delta update of {addon_id} failed, falling back to full zip: {e}", xbmc.LOGWARNING)
+    else:
+        log(f"No delta from {addon_id} {installed}, falling back to full zip", xbmc.LOGINFO)
+
+    try:
+        apply_full_zip(addon_id, addon_path, index, installed)
+        return latest
+    except Exception as e:
+        log(f"Full zip update of {addon_id} failed: {e}", xbmc.LOGERROR)
+        return None
+
+
 def update_all():
-    """Trigger repository update and check for updates."""
+    """Apply skin deltas, then trigger repository update and check for updates."""
+    if is_installed(AURION_SKIN_ID):
+        progress = xbmcgui.DialogProgressBG()
+        progress.create("Aurion", "Checking for skin updates...")
+        updated = delta_update(AURION_SKIN_ID)
+        progress.close()
+        if updated:
+            xbmc.executebuiltin('UpdateLocalAddons')
+            xbmcgui.Dialog().notification("Aurion", f"Skin updated to {updated}", xbmcgui.NOTIFICATION_INFO, 3000)
+            if xbmc.getSkinDir() == AURION_SKIN_ID:
+                xbmc.executebuiltin('ReloadSkin()')
+
     xbmc.executebuiltin('UpdateAddonRepos')
     xbmc.sleep(1500)
     xbmc.executebuiltin('UpdateLocalAddons')
@@ -1,62 +1,66 @@
 import sys
 import urllib.parse as urlparse
 
+import xbmc
 import xbmcaddon
 import xbmcgui
 import xbmcplugin
 
-from resources.lib import providers
+from resources.lib.common import log, reload_addon
 
-ADDON = xbmcaddon.Addon()
-HANDLE = int(sys.argv[1])
-BASE_URL = sys.argv[0]
+# Per-invocation state, set by run(). With reuselanguageinvoker Kodi keeps this
+# interpreter (and every imported module) alive between navigations.
+ADDON = None
+HANDLE = -1
+BASE_URL = ""
+PARAMS = {}
+
+SEARCH_RESULTS = 100  # most local index hits a search lists, over all pages
+MAX_PRERESOLVE = 5  # most titles a listing pre-resolves, whatever preresolve_top says
 
 
 def build_url(**qs):
     return BASE_URL + "?" + urlparse.urlencode(qs)
 
 
-def list_root():
-    items = [
-        ("Movies", {"action": "movies"}),
-        ("TV Shows", {"action": "tvshows"}),
-        ("Search", {"action": "search"}),
-        ("Accounts", {"action": "accounts"}),
-    ]
-    xbmcplugin.setPluginCategory(HANDLE, "Aurion")
-    xbmcplugin.setContent(HANDLE, "addons")
-    for label, query in items:
-        list_item = xbmcgui.ListItem(label=label)
-        xbmcplugin.addDirectoryItem(HANDLE, build_url(**query), list_item, isFolder=True)
+def folder(label, **query):
+    return build_url(**query), xbmcgui.ListItem(label=label), True
+
+
+def add_items(items, category, content):
+    """Submit a whole listing to Kodi in one addDirectoryItems call."""
+    xbmcplugin.setPluginCategory(HANDLE, category)
+    xbmcplugin.setContent(HANDLE, content)
+    xbmcplugin.addDirectoryItems(HANDLE, items, len(items))
     xbmcplugin.endOfDirectory(HANDLE)
 
 
+def list_root():
+    add_items([
+        folder("Movies", action="movies"),
+        folder("TV Shows", action="tvshows"),
+        folder("Search", action="search"),
+        folder("Accounts", action="accounts"),
+    ], "Aurion", "addons")
+
+
 def route_movies():
-    # stubs; to be replaced with provider calls
-    xbmcplugin.setPluginCategory(HANDLE, "Aurion Movies")
-    xbmcplugin.setContent(HANDLE, "videos")
-    for label, action in [("Trending", "trending"), ("Popular", "popular")]:
-        list_item = xbmcgui.ListItem(label)
-        xbmcplugin.addDirectoryItem(
-            HANDLE, build_url(action=action, type="movie"), list_item, True
-        )
-    xbmcplugin.endOfDirectory(HANDLE)
+    add_items([
+        folder("Trending", action="trending", type="movie"),
+        folder("Popular", action="popular", type="movie"),
+    ], "Aurion Movies", "videos")
 
 
 def route_tv():
-    xbmcplugin.setPluginCategory(HANDLE, "Aurion TV")
-    xbmcplugin.setContent(HANDLE, "videos")
-    for label, action in [("Trending", "trending"), ("Popular", "popular")]:
-        list_item = xbmcgui.ListItem(label)
-        xbmcplugin.addDirectoryItem(
-            HANDLE, build_url(action=action, type="tv"), list_item, True
-        )
-    xbmcplugin.endOfDirectory(HANDLE)
+    add_items([
+        folder("Trending", action="trending", type="tv"),
+        folder("Popular", action="popular", type="tv"),
+    ], "Aurion TV", "videos")
 
 
-def route_search(initial=None, media_type=None):
+def route_search(initial=None, media_type=None, page=1, limit=None):
     if initial:
-        show_results(query=initial, media_type=media_type)
+        show_results(query=initial, media_type=media_type, page=page, limit=limit)
         return
     keyboard = xbmcgui.Dialog().input("Search", type=xbmcgui.INPUT_ALPHANUM)
     if not keyboard:
@@ -65,30 +69,90 @@ def route_search(initial=None, media_type=None):
     show_results(query=keyboard, media_type=media_type)
 
 
-def show_results(query=None, media_type=None, action=None):
-    # placeholder list—wire to providers later
+def route_suggest(prefix):
+    """Titles from the local search index for a partly typed query, each opening its search."""
+    from resources.lib import searchindex
+    add_items([folder(title, action="search", query=title) for title in searchindex.suggest(prefix)],
+              "Aurion Search", "videos")
+
+
+def video_item(item, media_type, query, art_dir):
+    from resources.lib import artwork
+    # Prefetched images are handed over as local files so Kodi needn't download them
+    thumb = artwork.local(item.get("poster"), art_dir) or "DefaultVideo.png"  # Kodi's built-in fallback
+    list_item = xbmcgui.ListItem(item["title"])
+    list_item.setArt({"poster": thumb, "thumb": thumb, "icon": thumb,
+                      "fanart": artwork.local(item.get("fanart"), art_dir) or ""})
+    info = {"title": item["title"]}
+    if item.get("year"):
+        info["year"] = item["year"]
+    if item.get("plot"):
+        info["plot"] = item["plot"]
+    if item.get("rating"):
+        info["rating"] = item["rating"]
+    list_item.setInfo("video", info)
+    list_item.setProperty("IsPlayable", "true")
+    # When sources are ready, set URL to a resolver path
+    url = build_url(action="play", id=str(item["id"]), type=media_type or "", query=query)
+    return url, list_item, False
+
+
+def show_results(query=None, media_type=None, action=None, page=1, limit=None):
+    from resources.lib import artwork, metadata, searchindex
+    # trending/popular come from the metadata cache, searches from the local index
     label = query or action or "Item"
-    xbmcplugin.setPluginCategory(HANDLE, f"Aurion {label.title()}")
-    xbmcplugin.setContent(HANDLE, "videos")
-    for index in range(1, 11):
-        thumb = "DefaultVideo.png"  # Kodi's built-in fallback
-        list_item = xbmcgui.ListItem(f"{label} {index}")
-        list_item.setArt({"poster": thumb, "thumb": thumb, "icon": thumb})
-        list_item.setInfo("video", {"title": f"{label} {index}"})
-        list_item.setProperty("IsPlayable", "true")
-        # When sources are ready, set URL to a resolver path
-        xbmcplugin.addDirectoryItem(
-            HANDLE,
-            build_url(
-                action="play",
-                id=str(index),
-                type=media_type or "",
-                query=label,
-            ),
-            list_item,
-            isFolder=False,
-        )
-    xbmcplugin.endOfDirectory(HANDLE)
+    limit = limit or ADDON.getSettingInt("page_size") or metadata.PAGE_SIZE
+    art_dir = artwork.cache_dir()
+    if action in metadata.LISTS:
+        results, more = metadata.get_page(action, media_type, page, limit)
+        plays = [(media_type, item["title"]) for item in results]
+    else:
+        # Only ask TMDb when nothing cached matches; its results are indexed for next time
+        found = searchindex.search(label, media_type, SEARCH_RESULTS) or metadata.search_remote(label, media_type)
+        more = len(found) > page * limit
+        results = found[(page - 1) * limit:page * limit]
+        plays = [(item["media_type"], item["title"]) for item in results]
+        if not found:
+            # placeholder results until a tmdb_api_key is set
+            results = [{"id": index, "title": f"{label} {index}"} for index in range(1, 11)]
+            more = len(results) > page * limit
+            results = results[(page - 1) * limit:page * limit]
+            plays = [(media_type, label)] * len(results)
+    # plays holds each item's (type, query) play params
+    items = [video_item(item, play_type, play_query, art_dir)
+             for item, (play_type, play_query) in zip(results, plays)]
+    if more:
+        if action in metadata.LISTS:
+            next_url = build_url(action=action, type=media_type or "", page=page + 1, limit=limit)
+        else:
+            next_url = build_url(action="search", query=label, type=media_type or "", page=page + 1, limit=limit)
+        items.append((next_url, xbmcgui.ListItem(f"Next page ({page + 1})"), True))
+    add_items(items, f"Aurion {label.title()}" + (f" ({page})" if page > 1 else ""), "videos")
+    # Kodi is already drawing the listing; warm the caches for scrolling, the Next page item and play clicks
+    if action in metadata.LISTS:
+        from resources.lib import providers
+        providers.in_thread(prefetch_listing, action, media_type, page, limit, results, more)
+    top = min(ADDON.getSettingInt("preresolve_top"), MAX_PRERESOLVE)
+    if top > 0:
+        preresolve(plays[:top])
+
+
+def prefetch_listing(action, media_type, page, limit, results, more):
+    """
+    Store the next page of a trending/popular listing and download the
+    artwork of this page and of the next one, if it is stored. Runs on a
+    daemon thread, so the invoker is free for the next navigation.
+    """
+    from resources.lib import artwork, metadata
+    try:
+        if more and ADDON.getSettingBool("prefetch_next_page"):
+            metadata.prefetch(action, media_type, page + 1, limit)
+        if ADDON.getSettingBool("prefetch_artwork"):
+            if more:
+                results = results + metadata.get_page(action, media_type, page + 1, limit, cached_only=True)[0]
+            artwork.prefetch(url for item in results for url in (item.get("poster"), item.get("fanart")))
+    except Exception as e:
+        log(f"Prefetching {action} page {page + 1} failed: {e}", xbmc.LOGWARNING)
 
 
 def open_accounts():
@@ -107,13 +171,105 @@ def rd_device_auth():
         )
 
 
+def find_sources(search_term, media_type, use_rd, autoplay):
+    """
+    Sources for a title, from the source cache when the same search ran
+    within cache_ttl minutes, otherwise from the providers.
+    """
+    from resources.lib import cache, providers
+    use_cache = ADDON.getSettingBool("cache_enabled")
+    ttl = ADDON.getSettingInt("cache_ttl") * 60
+    if use_cache:
+        sources = cache.get(search_term, media_type, use_rd, ttl)
+        if sources:
+            return sources
+
+    progress = xbmcgui.DialogProgress()
+    progress.create("Aurion", "Searching providers...")
+    stopped = False  # canceled, or cut short by autoplay: the list is partial, so not cached
+
+    def on_source(done, total, source, sources):
+        nonlocal stopped
+        progress.update(
+            int(100 * done / max(total, 1)),
+            f"Found {len(sources)} sources ({done}/{total} providers)",
+        )
+        # Start playback on the first high-quality source instead of waiting for every provider
+        stopped = (autoplay and providers.is_high_quality(source)) or progress.iscanceled()
+        return not stopped
+
+    try:
+        sources = providers.get_sources(search_term, media_type, use_rd, on_source)
+    finally:
+        progress.close()
+    if use_cache and sources and not stopped:
+        cache.put(search_term, media_type, use_rd, sources, ttl,
+                  ADDON.getSettingInt("cache_size_mb") * 1024 * 1024)
+    return sources
+
+
+def preresolve(entries):
+    """
+    Speculatively scrape, rank and pick the top source for each
+    (media_type, query) a listing's play items would ask for, parking the
+    chosen URL where play_item looks first. Runs on two daemon threads and
+    returns at once, so the invoker is free for the next navigation.
+    """
+    from resources.lib import cache, providers, ranking
+    use_rd = ADDON.getSettingBool("rd_enabled")
+    use_cache = ADDON.getSettingBool("cache_enabled")
+    ttl = ADDON.getSettingInt("cache_ttl") * 60
+
+    def resolve(media_type, query):
+        media_type = media_type or "video"  # as play_item reads it
+        if cache.get_resolved(query, media_type, use_rd):
+            return
+        sources = cache.get(query, media_type, use_rd, ttl) if use_cache else None
+        if not sources:
+            sources = providers.get_sources(query, media_type, use_rd)
+            if use_cache and sources:
+                cache.put(query, media_type, use_rd, sources, ttl,
+                          ADDON.getSettingInt("cache_size_mb") * 1024 * 1024)
+        ranked = ranking.rank_sources(sources)
+        if ranked and ranked[0].get("url"):
+            cache.put_resolved(query, media_type, use_rd, ranked[0]["url"])
+
+    def resolve_all(entries):
+        for entry in entries:
+            try:
+                resolve(*entry)
+            except Exception as e:
+                log(f"Pre-resolving failed: {e}", xbmc.LOGWARNING)
+
+    entries = list(dict.fromkeys(entries))
+    for lane in (entries[0::2], entries[1::2]):
+        if lane:
+            providers.in_thread(resolve_all, lane)
+
+
+def clear_cache():
+    from resources.lib import cache
+    if cache.clear():
+        xbmcgui.Dialog().notification("Aurion", "Source cache cleared", xbmcgui.NOTIFICATION_INFO, 3000)
+
+
 def play_item():
     # later: collect sources -> optionally RD -> resolve -> setResolvedUrl
-    query = dict(urlparse.parse_qsl(sys.argv[2][1:])) if len(sys.argv) > 2 else {}
-    media_type = query.get("type") or "video"
-    search_term = query.get("query") or ""
+    from resources.lib import cache, providers, ranking
+    media_type = PARAMS.get("type") or "video"
+    search_term = PARAMS.get("query") or ""
     use_rd = ADDON.getSettingBool("rd_enabled")
-    sources = providers.get_sources(search_term, media_type, use_rd)
+    if ADDON.getSettingInt("preresolve_top"):
+        url = cache.get_resolved(search_term, media_type, use_rd)
+        if url:
+            list_item = xbmcgui.ListItem(path=url)
+            list_item.setProperty("IsPlayable", "true")
+            xbmcplugin.setResolvedUrl(HANDLE, True, list_item)
+            return
+    autoplay = ADDON.getSettingBool("autoplay")
+    sources = ranking.rank_sources(find_sources(search_term, media_type, use_rd, autoplay))
+    if autoplay and sources and providers.is_high_quality(sources[0]):
+        sources = sources[:1]
     if not sources:
         xbmcgui.Dialog().notification("Aurion", "No sources found", xbmcgui.NOTIFICATION_WARNING, 3000)
         xbmcplugin.setResolvedUrl(HANDLE, False, xbmcgui.ListItem())
@@ -122,7 +278,7 @@ def play_item():
     if len(sources) == 1:
         selected = sources[0]
     else:
-        choice = xbmcgui.Dialog().select("Choose source", [s.get("label", "Source") for s in sources])
+        choice = xbmcgui.Dialog().select("Choose source", [ranking.describe(s) for s in sources])
         if choice == -1:
             xbmcplugin.setResolvedUrl(HANDLE, False, xbmcgui.ListItem())
             return
@@ -133,27 +289,54 @@ def play_item():
     xbmcplugin.setResolvedUrl(HANDLE, True, list_item)
 
 
-def router():
-    query = dict(urlparse.parse_qsl(sys.argv[2][1:])) if len(sys.argv) > 2 else {}
-    action = query.get("action")
-    if action is None:
-        list_root()
-    elif action == "movies":
-        route_movies()
-    elif action == "tvshows":
-        route_tv()
-    elif action == "search":
-        route_search(query.get("query"), query.get("type"))
-    elif action in ("trending", "popular"):
-        show_results(action=action, media_type=query.get("type"))
-    elif action == "accounts":
-        open_accounts()
-    elif action == "rd_auth":
-        rd_device_auth()
-    elif action == "play":
-        play_item()
-    else:
-        list_root()
+def page_param(query):
+    try:
+        return max(1, int(query.get("page", 1)))
+    except ValueError:
+        return 1
+
+
+def limit_param(query):
+    try:
+        return min(max(1, int(query["limit"])), 200)
+    except (KeyError, ValueError):
+        return None
+
+
+# action -> handler(params); heavy modules are imported inside the handlers that need them
+ROUTES = {
+    "movies": lambda params: route_movies(),
+    "tvshows": lambda params: route_tv(),
+    "search": lambda params: route_search(params.get("query"), params.get("type"),
+                                          page_param(params), limit_param(params)),
+    "trending": lambda params: show_results(action="trending", media_type=params.get("type"),
+                                            page=page_param(params), limit=limit_param(params)),
+    "popular": lambda params: show_results(action="popular", media_type=params.get("type"),
+                                           page=page_param(params), limit=limit_param(params)),
+    "suggest": lambda params: route_suggest(params.get("query", "")),
+    "accounts": lambda params: open_accounts(),
+    "rd_auth": lambda params: rd_device_auth(),
+    "play": lambda params: play_item(),
+    "clear_cache": lambda params: clear_cache(),
+}
+
+
+def begin(argv):
+    """
+    Reset all per-invocation state from this call's argv. Library modules
+    stay imported across calls, so they are handed the fresh Addon too and
+    pick up settings changed since the last navigation.
+    """
+    global ADDON, HANDLE, BASE_URL, PARAMS
+    ADDON = reload_addon()
+    BASE_URL = argv[0]
+    HANDLE = int(argv[1]) if len(argv) > 1 else -1
+    PARAMS = dict(urlparse.parse_qsl(argv[2][1:])) if len(argv) > 2 else {}
+
+
+def router(argv=None):
+    begin(argv or sys.argv)
+    ROUTES.get(PARAMS.get("action"), lambda params: list_root())(PARAMS)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import xbmc
+import xbmcaddon
+from resources.lib import net
+from resources.lib.common import log, profile_path
+
+ADDON = xbmcaddon.Addon()
+
+DOWNLOAD_THREADS = 4  # images fetched at once; net also caps each host
+DOWNLOAD_TIMEOUT = 30  # seconds to wait for a whole prefetch batch
+EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def cache_dir():
+    return os.path.dirname(profile_path("artwork", ""))
+
+
+def cache_path(url, folder=None):
+    ext = os.path.splitext(url.split("?", 1)[0])[1].lower()
+    name = hashlib.sha1(url.encode("utf-8")).hexdigest() + (ext if ext in EXTENSIONS else ".jpg")
+    return os.path.join(folder or cache_dir(), name)
+
+
+def local(url, folder=None):
+    """
+    The cached copy's path for a remote image URL, or the URL itself when
+    it isn't cached. A hit counts as a use for LRU eviction.
+    """
+    if not url or "://" not in url:
+        return url
+    path = cache_path(url, folder)
+    try:
+        os.utime(path)
+    except OSError:
+        return url
+    return path
+
+
+def download(url, folder):
+    path = cache_path(url, folder)
+    if os.path.exists(path):
+        return 0
+    tmp_path = None
+    try:
+        body = net.get(url).raise_for_status().body
+        # A temp file of its own: overlapping prefetches may fetch the same image
+        fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        log(f"Artwork download failed for {url}: {e}", xbmc.LOGWARNING)
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return 0
+    return len(body)
+
+
+def evict(folder, max_bytes):
+    """Delete least recently used images until the cache fits in max_bytes."""
+    files = []
+    for entry in os.scandir(folder):
+        if entry.is_file() and not entry.name.endswith(".tmp"):  # skip downloads in progress
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def download_all(urls, folder, max_bytes):
+    """Download urls into folder a few at a time, then trim the cache to max_bytes."""
+    started = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=DOWNLOAD_THREADS, thread_name_prefix="aurion-art")
+    done, pending = wait([pool.submit(download, url, folder) for url in urls], timeout=DOWNLOAD_TIMEOUT)
+    for future in pending:
+        future.cancel()
+    pool.shutdown(wait=False)
+    fetched = 0
+    for future in done:
+        try:
+            fetched += future.result()
+        except Exception as e:
+            log(f"Artwork download failed: {e}", xbmc.LOGWARNING)
+    log(f"Prefetched {len(urls)} images ({fetched // 1024} KB) in {time.monotonic() - started:.2f}s")
+    evict(folder, max_bytes)
+
+
+def prefetch(urls):
+    """
+    Download every remote image in urls that isn't cached yet on a
+    background thread, then trim the cache to the artwork_cache_mb
+    setting. Returns at once.
+    """
+    folder = cache_dir()
+    urls = {url for url in urls if url and "://" in url and not os.path.exists(cache_path(url, folder))}
+    if not urls:
+        return
+    max_bytes = (ADDON.getSettingInt("artwork_cache_mb") or 100) * 1024 * 1024
+    threading.Thread(target=download_all, args=(urls, folder, max_bytes),
+                     name="aurion-art-prefetch", daemon=True).start()
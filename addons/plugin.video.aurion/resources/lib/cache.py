@@ -0,0 +1,131 @@
+import json
+import sqlite3
+import time
+
+import xbmc
+import xbmcaddon
+
+from resources.lib import common
+from resources.lib.common import log
+
+ADDON = xbmcaddon.Addon()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    query TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    debrid INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (query, media_type, debrid)
+);
+CREATE INDEX IF NOT EXISTS sources_accessed ON sources (accessed);
+CREATE TABLE IF NOT EXISTS resolved (
+    query TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    debrid INTEGER NOT NULL,
+    created REAL NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (query, media_type, debrid)
+);
+"""
+RESOLVED_TTL = 300  # seconds a speculatively resolved stream URL is trusted
+
+
+def connect():
+    """Open the cache database in one transaction, closing it afterwards."""
+    return common.connect("sources.db", SCHEMA)
+
+
+def key(query, media_type, debrid):
+    return " ".join(query.lower().split()), media_type or "", int(bool(debrid))
+
+
+def get(query, media_type, debrid, ttl):
+    """
+    Cached sources for a search made less than ttl seconds ago, or None.
+    """
+    try:
+        with connect() as conn:
+            row = conn.execute(
+                "SELECT created, data FROM sources WHERE query = ? AND media_type = ? AND debrid = ?",
+                key(query, media_type, debrid),
+            ).fetchone()
+            if row is None or time.time() - row[0] > ttl:
+                return None
+            conn.execute(
+                "UPDATE sources SET accessed = ? WHERE query = ? AND media_type = ? AND debrid = ?",
+                (time.time(),) + key(query, media_type, debrid),
+            )
+            return json.loads(row[1])
+    except (sqlite3.Error, ValueError) as e:
+        log(f"Source cache read failed: {e}", xbmc.LOGWARNING)
+        return None
+
+
+def put(query, media_type, debrid, sources, ttl, max_bytes):
+    """
+    Store sources for a search, then drop expired entries and the least
+    recently used ones until the cache fits in max_bytes.
+    """
+    data = json.dumps(sources)
+    now = time.time()
+    try:
+        with connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key(query, media_type, debrid) + (now, now, len(data), data),
+            )
+            evict(conn, now - ttl, max_bytes)
+    except sqlite3.Error as e:
+        log(f"Source cache write failed: {e}", xbmc.LOGWARNING)
+
+
+def evict(conn, expired_before, max_bytes):
+    conn.execute("DELETE FROM sources WHERE created < ?", (expired_before,))
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM sources").fetchone()[0]
+    if total <= max_bytes:
+        return
+    for rowid, size in conn.execute("SELECT rowid, size FROM sources ORDER BY accessed").fetchall():
+        conn.execute("DELETE FROM sources WHERE rowid = ?", (rowid,))
+        total -= size
+        if total <= max_bytes:
+            break
+
+
+def get_resolved(query, media_type, debrid):
+    """Stream URL resolved ahead of time for a play request, or None."""
+    try:
+        with connect() as conn:
+            row = conn.execute(
+                "SELECT url FROM resolved WHERE query = ? AND media_type = ? AND debrid = ? AND created > ?",
+                key(query, media_type, debrid) + (time.time() - RESOLVED_TTL,),
+            ).fetchone()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        log(f"Resolved URL cache read failed: {e}", xbmc.LOGWARNING)
+        return None
+
+
+def put_resolved(query, media_type, debrid, url):
+    now = time.time()
+    try:
+        with connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO resolved VALUES (?, ?, ?, ?, ?)",
+                         key(query, media_type, debrid) + (now, url))
+            conn.execute("DELETE FROM resolved WHERE created < ?", (now - RESOLVED_TTL,))
+    except sqlite3.Error as e:
+        log(f"Resolved URL cache write failed: {e}", xbmc.LOGWARNING)
+
+
+def clear():
+    try:
+        with connect() as conn:
+            conn.execute("DELETE FROM sources")
+            conn.execute("DELETE FROM resolved")
+        return True
+    except sqlite3.Error as e:
+        log(f"Clearing source cache failed: {e}", xbmc.LOGWARNING)
+        return False
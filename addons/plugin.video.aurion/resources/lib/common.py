@@ -0,0 +1,52 @@
+import contextlib
+import os
+import sqlite3
+import sys
+
+import xbmc
+import xbmcaddon
+import xbmcvfs
+
+ADDON = xbmcaddon.Addon()
+
+
+def log(message, level=xbmc.LOGDEBUG):
+    xbmc.log(f"[plugin.video.aurion] {message}", level)
+
+
+def reload_addon():
+    """
+    Create a fresh Addon and hand it to every imported resources.lib
+    module. Those modules stay imported across plugin calls (with
+    reuselanguageinvoker) and for the service's whole life, so this is how
+    they see settings changed since they were loaded.
+    """
+    addon = xbmcaddon.Addon()
+    for name, module in list(sys.modules.items()):
+        if name.startswith("resources.lib.") and hasattr(module, "ADDON"):
+            module.ADDON = addon
+    return addon
+
+
+def profile_path(*parts):
+    """Path of parts under the addon's profile folder, creating its parent folder."""
+    path = os.path.join(xbmcvfs.translatePath(ADDON.getAddonInfo("profile")), *parts)
+    folder = os.path.dirname(path)
+    if not os.path.isdir(folder):
+        xbmcvfs.mkdirs(folder)
+    return path
+
+
+@contextlib.contextmanager
+def connect(name, schema):
+    """
+    Open the profile database name (creating schema if needed) in one
+    transaction, closing it afterwards.
+    """
+    conn = sqlite3.connect(profile_path(name), timeout=5)
+    try:
+        conn.executescript(schema)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
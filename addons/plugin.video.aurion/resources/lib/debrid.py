@@ -0,0 +1,105 @@
+import base64
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import xbmc
+import xbmcaddon
+
+from resources.lib import net
+from resources.lib.common import log
+from resources.lib.ranking import INFOHASH
+
+ADDON = xbmcaddon.Addon()
+
+API_URL = "https://api.real-debrid.com/rest/1.0"
+AVAILABILITY_TTL = 300   # seconds a cached/not-cached answer is trusted
+HASHES_PER_REQUEST = 100  # keeps instantAvailability URLs well under server limits
+
+_availability = {}  # infohash -> (checked_at, cached)
+_lock = threading.Lock()
+
+
+def api_url():
+    return (ADDON.getSetting("rd_api_url") or API_URL).rstrip("/")
+
+
+def infohash(source):
+    """Lowercase hex infohash of a torrent source, or None."""
+    value = source.get("hash") or ""
+    if not value:
+        match = INFOHASH.search(source.get("url", "").lower())
+        value = match.group(1) if match else ""
+    value = value.lower()
+    if len(value) == 32:
+        try:
+            value = base64.b32decode(value.upper()).hex()
+        except ValueError:
+            return None
+    return value if len(value) == 40 else None
+
+
+def instant_availability(hashes, token, timeout):
+    """
+    Ask Real-Debrid which infohashes are cached, HASHES_PER_REQUEST per
+    request. Answers are memoized for AVAILABILITY_TTL seconds, so only
+    hashes not seen recently go over the network. Returns the cached set.
+    """
+    now = time.monotonic()
+    with _lock:
+        known = {h: _availability[h][1] for h in hashes
+                 if h in _availability and now - _availability[h][0] < AVAILABILITY_TTL}
+    missing = sorted(set(hashes) - known.keys())
+    for start in range(0, len(missing), HASHES_PER_REQUEST):
+        chunk = missing[start:start + HASHES_PER_REQUEST]
+        try:
+            data = net.get(
+                f"{api_url()}/torrents/instantAvailability/{'/'.join(chunk)}",
+                headers={"Authorization": f"Bearer {token}"},
+                timeout=timeout,
+            ).raise_for_status().json()
+        except (OSError, ValueError) as e:
+            log(f"Real-Debrid availability check failed: {e}", xbmc.LOGWARNING)
+            continue
+        if not isinstance(data, dict):
+            data = {}
+        checked = time.monotonic()
+        answers = {h: isinstance(data.get(h), dict) and bool(data[h].get("rd")) for h in chunk}
+        with _lock:
+            for h, cached in answers.items():
+                _availability[h] = (checked, cached)
+        known.update(answers)
+    return {h for h, cached in known.items() if cached}
+
+
+class AvailabilityChecker:
+    """
+    Runs one batched availability query per provider run on a background
+    thread, so checks overlap with the providers still scraping.
+    """
+
+    def __init__(self, token, timeout):
+        self.token = token
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="aurion-debrid")
+        self.futures = []
+
+    def submit(self, sources):
+        hashes = {h for h in map(infohash, sources) if h}
+        if hashes:
+            self.futures.append(self.pool.submit(instant_availability, hashes, self.token, self.timeout))
+
+    def mark(self, sources, timeout):
+        """
+        Wait up to timeout seconds for outstanding checks, then set
+        source["debrid"] on every source whose hash is cached.
+        """
+        done, _ = wait(self.futures, timeout=timeout)
+        self.pool.shutdown(wait=False)
+        cached = set()
+        for future in done:
+            cached |= future.result()
+        for source in sources:
+            if infohash(source) in cached:
+                source["debrid"] = True
+        return len(cached)
@@ -0,0 +1,241 @@
+import gzip
+import json
+import os
+import tempfile
+import time
+
+import xbmc
+import xbmcaddon
+import xbmcgui
+
+from resources.lib import net, searchindex
+from resources.lib.common import log, profile_path
+
+ADDON = xbmcaddon.Addon()
+
+TMDB_URL = "https://api.themoviedb.org/3"
+IMAGE_URL = "https://image.tmdb.org/t/p/"
+LISTS = ("trending", "popular")
+MEDIA_TYPES = ("movie", "tv")
+# Home window property the plugin uses to ask the service for a refresh
+REFRESH_PROPERTY = "plugin.video.aurion.metadata.refresh"
+PAGE_SIZE = 20  # items per TMDb list page
+
+
+def list_name(kind, media_type, page=1):
+    name = f"{kind}_{'tv' if media_type == 'tv' else 'movie'}"
+    return name if page == 1 else f"{name}_p{page}"
+
+
+def parse_name(name):
+    """(kind, media_type, page) back from a list_name."""
+    kind, media_type, *rest = name.split("_")
+    return kind, media_type, int(rest[0][1:]) if rest else 1
+
+
+def list_path(name):
+    # Not the "metadata" folder of earlier versions, which could hold stored placeholder lists
+    return profile_path("lists", f"{name}.json.gz")
+
+
+def max_age():
+    return (ADDON.getSettingInt("metadata_refresh") or 60) * 60
+
+
+def tmdb_item(result, media_type):
+    """Compact item dict from one TMDb list result."""
+    date = result.get("release_date") or result.get("first_air_date") or ""
+    item = {
+        "id": result.get("id"),
+        "title": result.get("title") or result.get("name") or "",
+        "year": int(date[:4]) if date[:4].isdigit() else 0,
+        "plot": result.get("overview") or "",
+        "rating": result.get("vote_average") or 0,
+    }
+    if result.get("poster_path"):
+        item["poster"] = f"{IMAGE_URL}w500{result['poster_path']}"
+    if result.get("backdrop_path"):
+        item["fanart"] = f"{IMAGE_URL}w1280{result['backdrop_path']}"
+    return item
+
+
+def placeholder_list(kind):
+    """The old placeholder items, listed while no tmdb_api_key is set. Never stored."""
+    return [{"id": index, "title": f"{kind.title()} {index}"} for index in range(1, 11)], 1
+
+
+def fetch_list(kind, media_type, page=1):
+    """Fetch one page of a trending/popular list from TMDb as (items, pages)."""
+    api_key = ADDON.getSetting("tmdb_api_key")
+    media = "tv" if media_type == "tv" else "movie"
+    base = (ADDON.getSetting("tmdb_api_url") or TMDB_URL).rstrip("/")
+    path = f"/trending/{media}/week" if kind == "trending" else f"/{media}/popular"
+    data = net.get(f"{base}{path}", params={"api_key": api_key, "page": page}).raise_for_status().json()
+    return [tmdb_item(result, media) for result in data.get("results", [])], data.get("total_pages", 1)
+
+
+def search_remote(query, media_type=None):
+    """
+    Search TMDb for movies and TV shows matching query and add them to the
+    local search index. Returns the items with their media_type, or [] when
+    no tmdb_api_key is set or the request fails.
+    """
+    api_key = ADDON.getSetting("tmdb_api_key")
+    if not api_key:
+        return []
+    base = (ADDON.getSetting("tmdb_api_url") or TMDB_URL).rstrip("/")
+    path = f"/search/{media_type}" if media_type in MEDIA_TYPES else "/search/multi"
+    try:
+        data = net.get(f"{base}{path}", params={"api_key": api_key, "query": query}).raise_for_status().json()
+    except (OSError, ValueError) as e:
+        log(f"TMDb search failed: {e}", xbmc.LOGWARNING)
+        return []
+    results = []
+    for result in data.get("results", []):
+        media = media_type if media_type in MEDIA_TYPES else result.get("media_type")
+        if media in MEDIA_TYPES:
+            results.append(dict(tmdb_item(result, media), media_type=media))
+    for media in MEDIA_TYPES:
+        searchindex.update([item for item in results if item["media_type"] == media], media)
+    return results
+
+
+def load(name):
+    """(fetched_at, items, pages) stored for a list page, or (0, None, 0)."""
+    try:
+        with gzip.open(list_path(name), "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        return data["fetched"], data["items"], data.get("pages", 1)
+    except (OSError, ValueError, KeyError) as e:
+        if not isinstance(e, FileNotFoundError):
+            log(f"Metadata cache {name} unreadable: {e}", xbmc.LOGWARNING)
+        return 0, None, 0
+
+
+def store(name, items, pages):
+    """
+    Write a list page as minified, gzipped JSON, replacing the old file
+    atomically. Each write goes through its own temp file, as the plugin
+    and the service may store the same page at once.
+    """
+    path = list_path(name)
+    data = json.dumps({"fetched": time.time(), "items": items, "pages": pages}, separators=(",", ":"))
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def refresh(kind, media_type, page=1):
+    """
+    Fetch and store one list page. Returns (items, pages), or None on
+    failure or when no tmdb_api_key is set.
+    """
+    if not ADDON.getSetting("tmdb_api_key"):
+        return None
+    name = list_name(kind, media_type, page)
+    started = time.monotonic()
+    try:
+        items, pages = fetch_list(kind, media_type, page)
+        store(name, items, pages)
+    except (OSError, ValueError) as e:
+        log(f"Refreshing {name} failed: {e}", xbmc.LOGWARNING)
+        return None
+    searchindex.update(items, media_type)
+    log(f"Refreshed {name}: {len(items)} items in {time.monotonic() - started:.2f}s")
+    return items, pages
+
+
+def request_refresh(name):
+    window = xbmcgui.Window(10000)
+    wanted = set(filter(None, window.getProperty(REFRESH_PROPERTY).split(",")))
+    if name not in wanted:
+        window.setProperty(REFRESH_PROPERTY, ",".join(sorted(wanted | {name})))
+
+
+def take_refresh_requests():
+    """Names of lists the plugin found stale since the last call."""
+    window = xbmcgui.Window(10000)
+    wanted = window.getProperty(REFRESH_PROPERTY)
+    if not wanted:
+        return set()
+    window.clearProperty(REFRESH_PROPERTY)
+    return set(wanted.split(","))
+
+
+def get_list(kind, media_type, page=1):
+    """
+    (items, pages) for one TMDb page of a trending/popular listing, served
+    from the on-disk cache (stale-while-revalidate): a stale page is still
+    returned at once and the background service is asked to refresh it.
+    Only a page never fetched before is fetched here, blocking.
+    """
+    if not ADDON.getSetting("tmdb_api_key"):
+        return placeholder_list(kind)
+    name = list_name(kind, media_type, page)
+    fetched, items, pages = load(name)
+    if items is None:
+        return refresh(kind, media_type, page) or ([], 0)
+    if time.time() - fetched > max_age():
+        log(f"Metadata {name} is stale, requesting refresh")
+        request_refresh(name)
+    return items, pages
+
+
+def get_page(kind, media_type, page, limit, cached_only=False):
+    """
+    Items page (1-based) of limit items from a listing, plus whether a
+    further page exists. Reads only the TMDb pages that overlap it. With
+    cached_only, only stored pages are read: nothing is fetched and a page
+    never stored ends the listing.
+    """
+    start, end = (page - 1) * limit, page * limit
+    items, pages = [], 1
+    for tmdb_page in range(start // PAGE_SIZE + 1, (end - 1) // PAGE_SIZE + 2):
+        if cached_only:
+            _, page_items, pages = load(list_name(kind, media_type, tmdb_page))
+            page_items = page_items or []
+        else:
+            page_items, pages = get_list(kind, media_type, tmdb_page)
+        items += page_items
+        if tmdb_page >= pages:
+            break
+    offset = start % PAGE_SIZE
+    more = (end - 1) // PAGE_SIZE + 1 < pages or len(items) > offset + limit
+    return items[offset:offset + limit], more
+
+
+def prefetch(kind, media_type, page, limit):
+    """Store the TMDb pages behind listing page page unless already cached."""
+    start, end = (page - 1) * limit, page * limit
+    pages = load(list_name(kind, media_type))[2] or 1
+    for tmdb_page in range(start // PAGE_SIZE + 1, min((end - 1) // PAGE_SIZE + 1, pages) + 1):
+        if age(list_name(kind, media_type, tmdb_page)) > max_age():
+            refresh(kind, media_type, tmdb_page)
+
+
+def age(name):
+    """Seconds since a list was stored (its file's mtime), infinite if never."""
+    try:
+        return time.time() - os.path.getmtime(list_path(name))
+    except OSError:
+        return float("inf")
+
+
+def due_lists(wanted=()):
+    """
+    (kind, media_type, page) of every first page that is stale, plus any
+    page the plugin asked for. None without a tmdb_api_key.
+    """
+    if not ADDON.getSetting("tmdb_api_key"):
+        return []
+    due = {parse_name(name) for name in wanted}
+    for kind in LISTS:
+        for media_type in MEDIA_TYPES:
+            if age(list_name(kind, media_type)) > max_age():
+                due.add((kind, media_type, 1))
+    return sorted(due)
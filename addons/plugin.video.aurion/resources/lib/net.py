@@ -0,0 +1,188 @@
+import gzip
+import http.client
+import json
+import threading
+import urllib.parse as urlparse
+import zlib
+
+import xbmcaddon
+
+from resources.lib.common import log
+
+ADDON = xbmcaddon.Addon()
+
+USER_AGENT = "Aurion/1.0 (Kodi plugin.video.aurion)"
+MAX_PER_HOST = 4     # requests in flight to one host at a time
+MAX_IDLE_PER_HOST = 4
+MAX_REDIRECTS = 5
+RETRYABLE = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+             http.client.BadStatusLine)
+
+
+class HTTPError(OSError):
+    def __init__(self, response):
+        super().__init__(f"HTTP {response.status} for {response.url}")
+        self.response = response
+
+
+class Response:
+    def __init__(self, url, status, headers, body):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8"))
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise HTTPError(self)
+        return self
+
+
+class Session:
+    """
+    Thread-safe HTTP/1.1 client shared by providers, debrid and metadata
+    code: keeps idle connections per host for reuse (so TLS handshakes
+    happen once), caps concurrent requests per host, and asks for gzip.
+    """
+
+    def __init__(self, max_per_host=MAX_PER_HOST, max_idle=MAX_IDLE_PER_HOST):
+        self.max_per_host = max_per_host
+        self.max_idle = max_idle
+        self.lock = threading.Lock()
+        self.idle = {}    # (scheme, host, port) -> [connection]
+        self.slots = {}   # (scheme, host, port) -> BoundedSemaphore
+
+    def slot(self, key):
+        with self.lock:
+            if key not in self.slots:
+                self.slots[key] = threading.BoundedSemaphore(self.max_per_host)
+            return self.slots[key]
+
+    def checkout(self, key, timeout):
+        with self.lock:
+            idle = self.idle.get(key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=timeout), False
+
+    def checkin(self, key, conn):
+        with self.lock:
+            idle = self.idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method, url, headers=None, data=None, timeout=None):
+        """
+        Send a request and read the whole (decompressed) body. Follows
+        redirects; timeout defaults to the addon's timeout setting.
+        Returns a Response whatever its status.
+        """
+        if timeout is None:
+            timeout = ADDON.getSettingInt("timeout") or 15
+        headers = dict(headers or {})
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self.send(method, url, headers, data, timeout)
+            location = response.headers.get("location")
+            if response.status not in (301, 302, 303, 307, 308) or not location:
+                return response
+            target = urlparse.urljoin(url, location)
+            if urlparse.urlsplit(target).netloc != urlparse.urlsplit(url).netloc:
+                # Never hand credentials meant for one host to another
+                headers = {k: v for k, v in headers.items() if k.lower() != "authorization"}
+            url = target
+            if response.status == 303:
+                method, data = "GET", None
+        return response
+
+    def send(self, method, url, headers, data, timeout):
+        parts = urlparse.urlsplit(url)
+        scheme = parts.scheme or "http"
+        key = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        if isinstance(data, (dict, list)):
+            data = json.dumps(data).encode("utf-8")
+            headers = dict(headers, **{"Content-Type": "application/json"})
+        headers = dict({"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"}, **headers)
+
+        with self.slot(key):
+            for attempt in range(2):
+                conn, reused = self.checkout(key, timeout)
+                try:
+                    conn.request(method, path, body=data, headers=headers)
+                    raw = conn.getresponse()
+                    body = raw.read()
+                except (OSError, http.client.HTTPException) as e:
+                    conn.close()
+                    # A pooled connection the server already closed; retry once on a fresh one
+                    if isinstance(e, RETRYABLE) and reused and attempt == 0:
+                        log(f"Stale pooled connection to {parts.hostname}, reconnecting")
+                        continue
+                    if isinstance(e, OSError):
+                        raise
+                    # IncompleteRead, LineTooLong, BadStatusLine...: callers only handle OSError
+                    raise OSError(f"Bad response from {parts.hostname}: {e!r}") from e
+                except Exception:
+                    conn.close()
+                    raise
+                if raw.will_close:
+                    conn.close()
+                else:
+                    self.checkin(key, conn)
+                break
+
+        encoding = (raw.getheader("Content-Encoding") or "").lower()
+        try:
+            if encoding == "gzip":
+                body = gzip.decompress(body)
+            elif encoding == "deflate":
+                body = zlib.decompress(body)
+        except (OSError, EOFError, zlib.error) as e:
+            raise OSError(f"Corrupt {encoding} body from {parts.hostname}: {e}") from e
+        return Response(url, raw.status, {k.lower(): v for k, v in raw.getheaders()}, body)
+
+    def get(self, url, headers=None, params=None, timeout=None):
+        if params:
+            url += ("&" if "?" in url else "?") + urlparse.urlencode(params)
+        return self.request("GET", url, headers, None, timeout)
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        return self.request("POST", url, headers, data, timeout)
+
+    def close(self):
+        with self.lock:
+            for idle in self.idle.values():
+                for conn in idle:
+                    conn.close()
+            self.idle.clear()
+
+
+SESSION = Session()
+
+
+def get(url, headers=None, params=None, timeout=None):
+    return SESSION.get(url, headers, params, timeout)
+
+
+def post(url, data=None, headers=None, timeout=None):
+    return SESSION.post(url, data, headers, timeout)
@@ -1,10 +1,22 @@
 import importlib
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
 
+import xbmc
 import xbmcaddon
 import xbmcgui
 
+from resources.lib import debrid
+from resources.lib.common import log
+
 ADDON = xbmcaddon.Addon()
 
+DEFAULT_THREADS = 8
+HIGH_QUALITY = ("2160p", "4k", "uhd", "1080p")
+
 
 def have_openscrapers():
     try:
@@ -20,26 +32,190 @@ def have_openscrapers():
         return False
 
 
-def get_sources(query, media_type, use_rd):
+def sample_provider(query, media_type, use_rd):
+    return [{"label": "Sample 1080p", "url": "https://example.com/stream.mp4", "quality": "1080p"}]
+
+
+def openscraper_provider(scraper):
     """
-    Build a list of stream sources for the requested media.
+    Wrap one OpenScrapers source class as a provider: look the title up,
+    then list its streams as source dicts.
     """
-    use_os = ADDON.getSettingBool("use_openscrapers") and have_openscrapers()
-    if use_os:
+    def provider(query, media_type, use_rd):
+        if media_type not in ("movie", "video"):
+            return []
+        url = scraper.movie("", query, query, [], "")
+        if not url:
+            return []
+        sources = []
+        for s in scraper.sources(url, [], []) or []:
+            if s.get("debridonly") and not use_rd:
+                continue
+            quality = s.get("quality", "SD")
+            sources.append({
+                "label": f"{s.get('source', 'Unknown')} {quality}",
+                "url": s.get("url", ""),
+                "quality": quality,
+                "host": s.get("source", ""),
+                "info": s.get("info", ""),
+            })
+        return sources
+    return provider
+
+
+def openscraper_providers():
+    try:
+        try:
+            module = importlib.import_module("resources.lib.modules.openscrapers")
+        except ImportError:
+            module = importlib.import_module("openscrapers")
+        return [(name, openscraper_provider(scraper)) for name, scraper in module.sources()]
+    except Exception as e:
+        log(f"OpenScrapers unavailable: {e}", xbmc.LOGWARNING)
+        xbmcgui.Dialog().notification(
+            "Aurion", "OpenScrapers error", xbmcgui.NOTIFICATION_ERROR, 3000
+        )
+        return []
+
+
+def enabled_providers():
+    """
+    [(name, provider)] for every enabled provider. A provider is called
+    as provider(query, media_type, use_rd) and returns source dicts.
+    """
+    providers = []
+    if ADDON.getSettingBool("use_openscrapers") and have_openscrapers():
+        providers += openscraper_providers()
+    return providers or [("sample", sample_provider)]
+
+
+def is_high_quality(source):
+    text = f"{source.get('quality', '')} {source.get('label', '')}".lower()
+    return any(tag in text for tag in HIGH_QUALITY)
+
+
+def in_thread(fn, *args):
+    """Run fn(*args) on a new daemon thread, returning a Future for its result."""
+    future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
         try:
-            # Placeholder for OpenScrapers integration.
-            # Example:
-            # sources = openscrapers.query(
-            #     query,
-            #     media_type,
-            #     debrid=use_rd,
-            #     timeout=ADDON.getSettingInt("timeout"),
-            # )
-            # return [{"label": s["host"], "url": s["url"]} for s in sources]
-            pass
-        except Exception:
-            xbmcgui.Dialog().notification(
-                "Aurion", "OpenScrapers error", xbmcgui.NOTIFICATION_ERROR, 3000
-            )
-
-    return [{"label": "Sample 1080p", "url": "https://example.com/stream.mp4"}]
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name="aurion-provider", daemon=True).start()
+    return future
+
+
+def iter_sources(providers, query, media_type, use_rd, timeout, threads=DEFAULT_THREADS, checker=None):
+    """
+    Run providers on a fixed pool of threads worker threads, which take
+    them from a queue, and yield (done, total, source) as each provider's
+    sources come in. Each provider gets timeout seconds from the moment it
+    starts; a slower one is abandoned, and the whole run is cut off after
+    timeout per round of threads providers. Each provider's batch is
+    handed to checker (a debrid.AvailabilityChecker) when given. Closing
+    the generator early drops queued providers and returns without
+    waiting for running ones.
+
+    Abandoned scrapers are not cancelled (Python threads can't be): one
+    keeps its worker until it returns, and its sources are ignored.
+    """
+    providers = list(providers)
+    threads = max(1, min(threads, len(providers)))
+    todo = queue.Queue()
+    for entry in providers:
+        todo.put(entry)
+    results = queue.Queue()
+    started = {}
+    closed = threading.Event()
+
+    def worker():
+        while not closed.is_set():
+            try:
+                name, provider = todo.get_nowait()
+            except queue.Empty:
+                return
+            started[name] = time.monotonic()
+            try:
+                results.put((name, provider(query, media_type, use_rd) or [], None))
+            except Exception as e:
+                results.put((name, None, e))
+
+    # Daemon threads so a hung scraper can't keep the interpreter from exiting
+    for _ in range(threads if providers else 0):
+        threading.Thread(target=worker, name="aurion-provider", daemon=True).start()
+    pending = {name for name, _ in providers}
+    total, done = len(pending), 0
+    deadline = time.monotonic() + timeout * math.ceil(total / threads)
+    try:
+        while pending:
+            now = time.monotonic()
+            deadlines = [started[name] + timeout for name in pending if name in started]
+            try:
+                name, sources, error = results.get(timeout=max(0.05, min(deadlines + [deadline]) - now))
+            except queue.Empty:
+                name = None
+            if name in pending:
+                pending.discard(name)
+                done += 1
+                if error is not None:
+                    log(f"Provider {name} failed: {error}", xbmc.LOGWARNING)
+                else:
+                    log(f"Provider {name}: {len(sources)} sources in {time.monotonic() - started[name]:.2f}s")
+                    if checker is not None:
+                        checker.submit(sources)
+                    for source in sources:
+                        source.setdefault("provider", name)
+                        yield done, total, source
+            now = time.monotonic()
+            for name in list(pending):
+                if name in started and now - started[name] > timeout:
+                    log(f"Provider {name} timed out after {timeout}s", xbmc.LOGWARNING)
+                    pending.discard(name)
+                    done += 1
+            if pending and now > deadline:
+                log(f"Giving up on {len(pending)} providers still running or queued", xbmc.LOGWARNING)
+                break
+    finally:
+        closed.set()
+
+
+def get_sources(query, media_type, use_rd, on_source=None):
+    """
+    Build a list of stream sources for the requested media.
+    Sources are collected from all enabled providers at once; collection
+    stops when the enough_sources setting's number of high-quality
+    sources is reached, or when on_source(done, total, source, sources)
+    returns False. With use_rd and a Real-Debrid token, each provider's
+    torrents are checked for RD cache status while the others are still
+    scraping, and cached ones get source["debrid"] = True.
+    """
+    timeout = ADDON.getSettingInt("timeout") or 15
+    threads = ADDON.getSettingInt("provider_threads") or DEFAULT_THREADS
+    enough = ADDON.getSettingInt("enough_sources")
+    sources, good = [], 0
+    started = time.monotonic()
+    token = ADDON.getSetting("rd_token") if use_rd else ""
+    checker = debrid.AvailabilityChecker(token, timeout) if token else None
+    stream = iter_sources(enabled_providers(), query, media_type, use_rd, timeout, threads, checker)
+    try:
+        for done, total, source in stream:
+            if not sources:
+                log(f"First source after {time.monotonic() - started:.2f}s")
+            sources.append(source)
+            good += is_high_quality(source)
+            if on_source is not None and on_source(done, total, source, sources) is False:
+                break
+            if enough and good >= enough:
+                log(f"{good} high-quality sources after {time.monotonic() - started:.2f}s, stopping early")
+                break
+    finally:
+        stream.close()
+    if checker is not None:
+        cached = checker.mark(sources, timeout)
+        log(f"{cached} Real-Debrid cached sources after {time.monotonic() - started:.2f}s")
+    return sources
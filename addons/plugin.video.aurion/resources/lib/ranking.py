@@ -0,0 +1,130 @@
+import re
+import urllib.parse as urlparse
+
+import xbmcaddon
+
+ADDON = xbmcaddon.Addon()
+
+# Release-name tokens, matched against the lowercase words of a label/URL
+RESOLUTIONS = {
+    "2160p": 2160, "2160": 2160, "4k": 2160, "uhd": 2160,
+    "1080p": 1080, "1080i": 1080, "1080": 1080, "fhd": 1080,
+    "720p": 720, "720": 720, "hd": 720,
+    "576p": 480, "480p": 480, "sd": 480, "dvdrip": 480,
+}
+LOW_QUALITY = {"cam", "hdcam", "camrip", "ts", "hdts", "telesync", "scr", "screener"}
+CODECS = {
+    "hevc": "HEVC", "x265": "HEVC", "h265": "HEVC",
+    "av1": "AV1",
+    "avc": "H264", "x264": "H264", "h264": "H264",
+}
+HDR = {"hdr", "hdr10", "dv", "dovi", "dolby", "hdr10plus"}
+SIZE_UNITS = {"gb": 1.0, "gib": 1.0, "mb": 1 / 1024, "mib": 1 / 1024}
+# Words with a letter stay whole ("2160p", "x265") except a size glued to its unit ("14gb" -> "14", "gb");
+# numbers keep a short decimal part ("18.2")
+WORD = re.compile(r"\d+(?:[.,]\d{1,2})?(?=[gm]i?b\b)|[a-z0-9]*[a-z][a-z0-9]*|\d+(?:[.,]\d{1,2}(?!\d))?")
+INFOHASH = re.compile(r"btih:([0-9a-f]{40}|[a-z2-7]{32})")
+
+DEFAULT_WEIGHTS = {
+    "quality": 1.0,    # per line of resolution
+    "hevc": 150.0,     # bonus when prefer_hevc is on
+    "hdr": 100.0,
+    "debrid": 400.0,   # cached on a debrid service
+    "host": 250.0,     # listed in preferred_hosts
+    "oversize": -5000.0,
+}
+
+
+def url_host(url):
+    """Host part of a URL without "www.", parsed by hand as urlsplit is slow in bulk."""
+    host = url.partition("://")[2].split("/", 1)[0].rpartition("@")[2].split(":", 1)[0].lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def parse_source(source):
+    """
+    Fill in resolution, codec, hdr, size_gb, host and a dedup key parsed
+    from a source's own fields, label and URL. Returns the source.
+    """
+    url = source.get("url", "")
+    label_words = WORD.findall(f"{source.get('quality', '')} {source.get('label', '')} {source.get('info', '')}".lower())
+    words = label_words
+    if not RESOLUTIONS.keys() & words:
+        # Labels usually repeat the release name; only read the URL when they don't
+        words = words + WORD.findall(urlparse.unquote(url).lower())
+    unique = set(words)
+
+    # Only labels can say CAM/TS: in a URL "ts" is as likely an MPEG-TS/HLS segment extension
+    if not LOW_QUALITY.isdisjoint(label_words):
+        source["resolution"] = 240
+    else:
+        source["resolution"] = max((RESOLUTIONS[w] for w in unique & RESOLUTIONS.keys()), default=0)
+    source["codec"] = next((CODECS[w] for w in unique & CODECS.keys()), "")
+    source["hdr"] = not HDR.isdisjoint(unique)
+    source["size_gb"] = 0.0
+    for unit in unique & SIZE_UNITS.keys():
+        index = words.index(unit)
+        if index and words[index - 1][0].isdigit():
+            source["size_gb"] = float(words[index - 1].replace(",", ".")) * SIZE_UNITS[unit]
+            break
+    if not source.get("host"):
+        source["host"] = url_host(url)
+    match = INFOHASH.search(url.lower()) if url.startswith("magnet:") else None
+    source["key"] = match.group(1) if match else url.strip().rstrip("/")
+    return source
+
+
+def scorer(weights=None):
+    """
+    Build a score(source) function from weights (DEFAULT_WEIGHTS by
+    default) and the prefer_hevc, max_size_gb and preferred_hosts
+    settings. Higher scores sort first.
+    """
+    w = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    prefer_hevc = ADDON.getSettingBool("prefer_hevc")
+    max_size = ADDON.getSettingInt("max_size_gb")
+    hosts = {h.strip().lower() for h in ADDON.getSetting("preferred_hosts").split(",") if h.strip()}
+
+    def score(source):
+        value = w["quality"] * source["resolution"]
+        if prefer_hevc and source["codec"] == "HEVC":
+            value += w["hevc"]
+        if source["hdr"]:
+            value += w["hdr"]
+        if source.get("debrid"):
+            value += w["debrid"]
+        if hosts and source["host"] in hosts:
+            value += w["host"]
+        if max_size and source["size_gb"] > max_size:
+            value += w["oversize"]
+        return value
+
+    return score
+
+
+def rank_sources(sources, score=None):
+    """
+    Parse, deduplicate (by infohash or URL, keeping the best-scored copy)
+    and sort sources best first. Ties keep arrival order.
+    """
+    score = score or scorer()
+    best = {}
+    for index, source in enumerate(sources):
+        parse_source(source)
+        ranked = (score(source), -index)
+        current = best.get(source["key"])
+        if current is None or ranked > current[0]:
+            best[source["key"]] = (ranked, source)
+    return [source for _, source in sorted(best.values(), key=lambda item: item[0], reverse=True)]
+
+
+def describe(source):
+    """Dialog label with the parsed quality, codec and size up front."""
+    tags = [f"{source['resolution']}p" if source.get("resolution") else "?"]
+    if source.get("codec"):
+        tags.append(source["codec"])
+    if source.get("hdr"):
+        tags.append("HDR")
+    if source.get("size_gb"):
+        tags.append(f"{source['size_gb']:.1f} GB")
+    return f"[{' '.join(tags)}] {source.get('label', 'Source')}"
@@ -0,0 +1,121 @@
+import json
+import re
+import sqlite3
+import time
+import unicodedata
+
+import xbmc
+import xbmcaddon
+
+from resources.lib import common
+from resources.lib.common import log
+
+ADDON = xbmcaddon.Addon()
+
+# terms is the inverted index: one (term, doc) row per word of a title.
+# WITHOUT ROWID keeps it clustered on the primary key, so a prefix lookup
+# is a single range scan.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id TEXT PRIMARY KEY,
+    media_type TEXT NOT NULL,
+    updated REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT NOT NULL,
+    doc TEXT NOT NULL,
+    PRIMARY KEY (term, doc)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS terms_doc ON terms (doc);
+"""
+TOKEN = re.compile(r"[a-z0-9]+")
+MAX_AGE = 30 * 24 * 3600  # drop titles no list or search has returned for this long
+
+
+def connect():
+    """Open the index database in one transaction, closing it afterwards."""
+    return common.connect("search.db", SCHEMA)
+
+
+def tokens(text):
+    """Lowercase ASCII words of text, with accents folded ("Amélie" -> "amelie")."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return TOKEN.findall(text.lower())
+
+
+def update(items, media_type):
+    """
+    Add or refresh metadata items (dicts with id and title) in the index,
+    replacing each item's terms. Called whenever the metadata cache stores
+    a list or a remote search returns, so the index grows incrementally.
+    """
+    now = time.time()
+    media_type = "tv" if media_type == "tv" else "movie"
+    try:
+        with connect() as conn:
+            for item in items:
+                doc = f"{media_type}:{item['id']}"
+                conn.execute("DELETE FROM terms WHERE doc = ?", (doc,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?)",
+                    (doc, media_type, now, json.dumps(item, separators=(",", ":"))),
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO terms VALUES (?, ?)",
+                    [(term, doc) for term in set(tokens(item.get("title", "")))],
+                )
+            conn.execute("DELETE FROM terms WHERE doc IN (SELECT id FROM docs WHERE updated < ?)",
+                         (now - MAX_AGE,))
+            conn.execute("DELETE FROM docs WHERE updated < ?", (now - MAX_AGE,))
+    except sqlite3.Error as e:
+        log(f"Search index update failed: {e}", xbmc.LOGWARNING)
+
+
+def prefix_docs(conn, word):
+    # Every term starting with word sorts between word and word + the highest code point
+    return {row[0] for row in conn.execute(
+        "SELECT doc FROM terms WHERE term >= ? AND term < ?", (word, word + "\U0010ffff"))}
+
+
+def search(query, media_type=None, limit=50):
+    """
+    Indexed titles matching every word of query, each word as a prefix
+    ("star wa" finds "Star Wars"), best first: whole-word matches, then
+    rating. Each result is the item dict plus its media_type.
+    """
+    words = tokens(query)
+    if not words:
+        return []
+    try:
+        with connect() as conn:
+            docs = None
+            for word in sorted(set(words), key=len, reverse=True):
+                docs = prefix_docs(conn, word) if docs is None else docs & prefix_docs(conn, word)
+                if not docs:
+                    return []
+            if media_type in ("movie", "tv"):
+                docs = {doc for doc in docs if doc.startswith(media_type + ":")}
+            docs, rows = sorted(docs), []
+            for start in range(0, len(docs), 500):  # stay under SQLite's bound-parameter limit
+                chunk = docs[start:start + 500]
+                rows += conn.execute(
+                    f"SELECT media_type, data FROM docs WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+    except sqlite3.Error as e:
+        log(f"Search index lookup failed: {e}", xbmc.LOGWARNING)
+        return []
+    results = [dict(json.loads(data), media_type=media) for media, data in rows]
+    wanted = set(words)
+    results.sort(key=lambda item: (len(wanted & set(tokens(item["title"]))), item.get("rating", 0)),
+                 reverse=True)
+    return results[:limit]
+
+
+def suggest(prefix, limit=10):
+    """Distinct titles for a partly typed query, for instant suggestions."""
+    titles = []
+    for item in search(prefix, limit=limit * 2):
+        if item["title"] not in titles:
+            titles.append(item["title"])
+    return titles[:limit]
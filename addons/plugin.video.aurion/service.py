@@ -0,0 +1,45 @@
+import time
+
+import xbmc
+
+from resources.lib import metadata
+from resources.lib.common import log, reload_addon
+
+POLL_SECONDS = 5  # how often to look for refresh requests from the plugin
+RETRY_SECONDS = 300  # wait after a failed refresh before trying that list again
+
+
+def run():
+    """
+    Keep the trending/popular metadata cache warm: refresh every list once
+    it is older than the metadata_refresh setting, and straight away when
+    the plugin has served a stale copy. Settings are re-read every round,
+    so a newly entered API key or interval applies without a restart.
+    """
+    monitor = xbmc.Monitor()
+    failed = {}  # list name -> time.monotonic() of its last failed refresh
+    log("Metadata service started", xbmc.LOGINFO)
+    while not monitor.abortRequested():
+        reload_addon()
+        for kind, media_type, page in metadata.due_lists(metadata.take_refresh_requests()):
+            name = metadata.list_name(kind, media_type, page)
+            if monitor.abortRequested():
+                break
+            if time.monotonic() - failed.get(name, -RETRY_SECONDS) < RETRY_SECONDS:
+                continue
+            try:
+                items = metadata.refresh(kind, media_type, page)
+            except Exception as e:
+                log(f"Refreshing {name} failed: {e}", xbmc.LOGERROR)
+                items = None
+            if items is None:
+                failed[name] = time.monotonic()
+            else:
+                failed.pop(name, None)
+        if monitor.waitForAbort(POLL_SECONDS):
+            break
+    log("Metadata service stopped", xbmc.LOGINFO)
+
+
+if __name__ == "__main__":
+    run()
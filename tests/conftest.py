@@ -0,0 +1,81 @@
+"""
+Minimal stand-ins for Kodi's xbmc* modules so the plugin's library code
+can be imported and tested outside Kodi. Settings live in
+xbmcaddon.SETTINGS; tests set what they need.
+"""
+import os
+import sys
+import tempfile
+import types
+
+# Bytecode written next to the addon sources would end up in the release zips
+sys.dont_write_bytecode = True
+
+PLUGIN_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "addons", "plugin.video.aurion")
+sys.path.insert(0, os.path.abspath(PLUGIN_DIR))
+
+
+def install_kodi_modules():
+    profile = tempfile.mkdtemp(prefix="aurion-profile-")
+
+    xbmc = types.ModuleType("xbmc")
+    xbmc.LOGDEBUG, xbmc.LOGINFO, xbmc.LOGWARNING, xbmc.LOGERROR = range(4)
+    xbmc.log = lambda message, level=0: None
+
+    class Monitor:
+        def abortRequested(self):
+            return False
+
+        def waitForAbort(self, timeout=0):
+            return False
+
+    xbmc.Monitor = Monitor
+
+    xbmcaddon = types.ModuleType("xbmcaddon")
+    xbmcaddon.SETTINGS = {}
+
+    class Addon:
+        def __init__(self, addon_id=None):
+            pass
+
+        def getAddonInfo(self, key):
+            return {"id": "plugin.video.aurion", "profile": profile}.get(key, "")
+
+        def getSetting(self, key):
+            return str(xbmcaddon.SETTINGS.get(key, ""))
+
+        def getSettingBool(self, key):
+            return bool(xbmcaddon.SETTINGS.get(key, False))
+
+        def getSettingInt(self, key):
+            return int(xbmcaddon.SETTINGS.get(key, 0))
+
+    xbmcaddon.Addon = Addon
+
+    xbmcgui = types.ModuleType("xbmcgui")
+    xbmcgui.PROPERTIES = {}
+
+    class Window:
+        def __init__(self, window_id=10000):
+            pass
+
+        def getProperty(self, key):
+            return xbmcgui.PROPERTIES.get(key, "")
+
+        def setProperty(self, key, value):
+            xbmcgui.PROPERTIES[key] = value
+
+        def clearProperty(self, key):
+            xbmcgui.PROPERTIES.pop(key, None)
+
+    xbmcgui.Window = Window
+
+    xbmcvfs = types.ModuleType("xbmcvfs")
+    xbmcvfs.translatePath = lambda path: path
+    xbmcvfs.mkdirs = lambda path: os.makedirs(path, exist_ok=True) or True
+
+    for module in (xbmc, xbmcaddon, xbmcgui, xbmcvfs):
+        sys.modules.setdefault(module.__name__, module)
+
+
+install_kodi_modules()
@@ -0,0 +1,39 @@
+"""Artwork cache downloads."""
+import os
+import threading
+
+from resources.lib import artwork, net
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        return self
+
+
+def test_overlapping_downloads_of_one_image(monkeypatch, tmp_path):
+    body = os.urandom(1 << 20)
+    started = threading.Barrier(8)
+
+    def get(url, **kwargs):
+        started.wait()
+        return FakeResponse(body)
+
+    monkeypatch.setattr(net, "get", get)
+    results = []
+
+    def download():
+        results.append(artwork.download("https://image.example/poster.jpg", str(tmp_path)))
+
+    threads = [threading.Thread(target=download) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [len(body)] * 8  # every download wrote a whole copy
+    path = artwork.cache_path("https://image.example/poster.jpg", str(tmp_path))
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+    with open(path, "rb") as f:
+        assert f.read() == body
@@ -0,0 +1,61 @@
+"""tools/build.py fetching published release manifests for skin deltas."""
+import functools
+import json
+import os
+import sys
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "tools"))
+import build  # noqa: E402
+
+
+def publish(site, version, older=()):
+    """Lay out a deployed site's zips/skin.aurion/ for version with deltas from older."""
+    addon_dir = site / "zips" / "skin.aurion"
+    addon_dir.mkdir(parents=True, exist_ok=True)
+    for release in (*older, version):
+        manifest = {"addon_id": "skin.aurion", "version": release, "files": {"addon.xml": release}}
+        (addon_dir / f"skin.aurion-{release}.files.json").write_text(json.dumps(manifest))
+    deltas = {release: {"file": f"skin.aurion-{release}-to-{version}.delta.zip"} for release in older}
+    (addon_dir / "deltas.json").write_text(json.dumps({"version": version, "deltas": deltas}))
+
+
+class Handler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def site(tmp_path):
+    """(site root folder, URL its zips/ folder is served at)."""
+    root = tmp_path / "site"
+    root.mkdir()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(Handler, directory=str(root)))
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield root, f"http://127.0.0.1:{httpd.server_port}/zips/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_a_clean_checkout_gets_the_published_releases_back(site, tmp_path):
+    root, url = site
+    publish(root, "1.3", older=["1.0", "1.1", "1.2"])
+    out_dir = tmp_path / "zips"
+    assert build.fetch_release_manifests(url, ["skin.aurion"], out_dir, 3) == 3
+    assert build.published_versions(out_dir / "skin.aurion", "skin.aurion") == ["1.1", "1.2", "1.3"]
+    assert build.release_files(out_dir / "skin.aurion", "skin.aurion", "1.2") == {"addon.xml": "1.2"}
+
+
+def test_nothing_published_yet(site, tmp_path):
+    assert build.fetch_release_manifests(site[1], ["skin.aurion"], tmp_path / "zips", 3) == 0
+
+
+def test_a_mismatched_manifest_is_skipped(site, tmp_path):
+    root, url = site
+    publish(root, "2.0")
+    path = root / "zips" / "skin.aurion" / "skin.aurion-2.0.files.json"
+    path.write_text(json.dumps({"addon_id": "skin.aurion", "version": "1.9", "files": {}}))
+    assert build.fetch_release_manifests(url, ["skin.aurion"], tmp_path / "zips", 3) == 0
@@ -0,0 +1,70 @@
+"""Real-Debrid availability checks against tools/mock_debrid.py."""
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+import xbmcaddon
+
+from resources.lib import debrid, providers
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "tools"))
+import mock_debrid  # noqa: E402
+
+
+def torrent(index):
+    """A magnet source whose hash ends in index's last hex digit (even = cached on the mock)."""
+    infohash = f"{index:040x}"
+    return {"label": f"Movie {index} 1080p", "url": f"magnet:?xt=urn:btih:{infohash}", "hash": infohash}
+
+
+@pytest.fixture
+def mock_rd(monkeypatch):
+    args = mock_debrid.parse_args(["--latency", "0", "--token", "secret"])
+    handler = mock_debrid.make_handler(args)
+    batches = []
+
+    class Recording(handler):
+        def do_GET(self):
+            if self.path.startswith(mock_debrid.PREFIX):
+                batches.append(len([h for h in self.path[len(mock_debrid.PREFIX):].split("/") if h]))
+            super().do_GET()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Recording)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    monkeypatch.setattr(xbmcaddon, "SETTINGS", {"rd_api_url": f"http://127.0.0.1:{httpd.server_port}/rest/1.0"})
+    monkeypatch.setattr(debrid, "_availability", {})
+    yield batches
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_one_request_per_provider_batch_split_at_the_limit(mock_rd):
+    small = [torrent(index) for index in range(10)]
+    large = [torrent(index) for index in range(1000, 1150)]
+    scrapers = [("small", lambda query, media_type, use_rd: small),
+                ("large", lambda query, media_type, use_rd: large)]
+    checker = debrid.AvailabilityChecker("secret", 5)
+    found = [source for _, _, source in providers.iter_sources(scrapers, "movie", "movie", True, 5, checker=checker)]
+    assert checker.mark(found, 5) == 80
+    assert sorted(mock_rd) == [10, 50, 100]
+
+
+def test_answers_are_memoized_for_the_ttl(mock_rd, monkeypatch):
+    hashes = {torrent(index)["hash"] for index in range(20)}
+    first = debrid.instant_availability(hashes, "secret", 5)
+    assert debrid.instant_availability(hashes | {torrent(20)["hash"]}, "secret", 5) == first | {torrent(20)["hash"]}
+    assert mock_rd == [20, 1]
+    monkeypatch.setattr(debrid, "AVAILABILITY_TTL", 0)
+    debrid.instant_availability(hashes, "secret", 5)
+    assert mock_rd == [20, 1, 20]
+
+
+def test_cached_sources_get_the_debrid_flag(mock_rd):
+    sources = [torrent(index) for index in range(4)] + [{"label": "Movie 720p", "url": "https://host.example/a.mkv"}]
+    checker = debrid.AvailabilityChecker("secret", 5)
+    checker.submit(sources)
+    assert checker.mark(sources, 5) == 2
+    assert [bool(source.get("debrid")) for source in sources] == [True, False, True, False, False]
@@ -0,0 +1,100 @@
+"""Trending/popular list cache and the background refresh service."""
+import json
+import os
+import threading
+
+import pytest
+import xbmc
+import xbmcaddon
+
+from resources.lib import metadata, net
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.body = json.dumps(data).encode()
+
+    def raise_for_status(self):
+        return self
+
+    def json(self):
+        return json.loads(self.body)
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(xbmcaddon, "SETTINGS", {"metadata_refresh": 60})
+    monkeypatch.setattr(metadata, "list_path", lambda name: str(tmp_path / f"{name}.json.gz"))
+
+
+def tmdb(calls):
+    def get(url, params=None, **kwargs):
+        calls.append(url)
+        return FakeResponse({"total_pages": 1, "results": [{"id": 7, "title": "Dune", "release_date": "2021-09-15"}]})
+    return get
+
+
+def test_placeholders_are_listed_but_never_stored(monkeypatch):
+    calls = []
+    monkeypatch.setattr(net, "get", tmdb(calls))
+    items, pages = metadata.get_list("trending", "movie")
+    assert [item["title"] for item in items][:2] == ["Trending 1", "Trending 2"]
+    assert metadata.refresh("trending", "movie") is None
+    assert metadata.due_lists() == []
+    assert not os.path.exists(metadata.list_path("trending_movie"))
+    assert calls == []
+
+
+def test_list_is_fetched_once_a_key_is_set(monkeypatch):
+    calls = []
+    monkeypatch.setattr(net, "get", tmdb(calls))
+    metadata.get_list("trending", "movie")
+    xbmcaddon.SETTINGS["tmdb_api_key"] = "key"
+    items, pages = metadata.get_list("trending", "movie")
+    assert items[0]["title"] == "Dune" and items[0]["year"] == 2021
+    assert len(calls) == 1
+    assert metadata.get_list("trending", "movie")[0] == items
+    assert len(calls) == 1
+
+
+def test_service_survives_a_failing_refresh(monkeypatch):
+    import service
+
+    rounds = []
+
+    class Monitor:
+        def abortRequested(self):
+            return len(rounds) >= 2
+
+        def waitForAbort(self, timeout=0):
+            rounds.append(timeout)
+            return len(rounds) >= 2
+
+    def refresh(kind, media_type, page=1):
+        raise RuntimeError("boom")
+
+    xbmcaddon.SETTINGS["tmdb_api_key"] = "key"
+    monkeypatch.setattr(xbmc, "Monitor", Monitor)
+    monkeypatch.setattr(metadata, "refresh", refresh)
+    service.run()
+    assert len(rounds) == 2
+
+
+def test_concurrent_stores_leave_a_whole_page(tmp_path):
+    items = [{"id": index, "title": f"Title {index}"} for index in range(2000)]
+    errors = []
+
+    def store():
+        try:
+            metadata.store("trending_movie", items, 3)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=store) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert metadata.load("trending_movie")[1:] == (items, 3)
+    assert os.listdir(tmp_path) == ["trending_movie.json.gz"]
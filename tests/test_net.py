@@ -0,0 +1,157 @@
+"""resources.lib.net against a local http.server on an ephemeral port."""
+import gzip
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import xbmcaddon
+
+from resources.lib import net
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.connections.add(self.client_address)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            self.route()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def route(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/gzip":
+            self.reply(gzip.compress(b"zipped"), {"Content-Encoding": "gzip"})
+        elif path == "/deflate":
+            self.reply(zlib.compress(b"deflated"), {"Content-Encoding": "deflate"})
+        elif path == "/bad-deflate":
+            self.reply(b"not deflate at all", {"Content-Encoding": "deflate"})
+        elif path == "/slow":
+            time.sleep(float(self.headers.get("X-Delay", "3")))
+            self.reply(b"late")
+        elif path == "/busy":
+            time.sleep(0.1)
+            self.reply(b"busy")
+        elif path == "/truncated":
+            self.send_response(200)
+            self.send_header("Content-Length", "1000")
+            self.end_headers()
+            self.wfile.write(b'{"results": [')
+            self.close_connection = True
+        elif path == "/close-after":
+            # Looks reusable to the client, but the server drops the connection
+            self.reply(b"once")
+            self.close_connection = True
+        elif path == "/redirect":
+            target = f"http://{self.headers['X-Target']}:{self.server.server_port}/auth"
+            self.send_response(302)
+            self.send_header("Location", target)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif path == "/auth":
+            self.reply(self.headers.get("Authorization", "none").encode())
+        else:
+            self.reply(self.path.encode())
+
+    def reply(self, body, headers=None):
+        self.send_response(200)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.connections = set()
+    httpd.in_flight = httpd.max_in_flight = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.url = f"http://127.0.0.1:{httpd.server_port}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def session():
+    xbmcaddon.SETTINGS["timeout"] = 5
+    session = net.Session()
+    yield session
+    session.close()
+
+
+def test_sequential_requests_reuse_one_connection(server, session):
+    for index in range(5):
+        assert session.get(f"{server.url}/item", params={"n": index}).text == f"/item?n={index}"
+    assert len(server.connections) == 1
+
+
+def test_gzip_and_deflate_bodies_are_decoded(server, session):
+    assert session.get(f"{server.url}/gzip").body == b"zipped"
+    assert session.get(f"{server.url}/deflate").body == b"deflated"
+
+
+def test_timeout_defaults_to_addon_setting(server, session):
+    xbmcaddon.SETTINGS["timeout"] = 1
+    started = time.monotonic()
+    with pytest.raises(OSError):
+        session.get(f"{server.url}/slow", headers={"X-Delay": "3"})
+    assert time.monotonic() - started < 2.5
+
+
+def test_explicit_timeout_overrides_setting(server, session):
+    xbmcaddon.SETTINGS["timeout"] = 1
+    assert session.get(f"{server.url}/slow", headers={"X-Delay": "1.5"}, timeout=5).text == "late"
+
+
+def test_per_host_cap_limits_requests_in_flight(server):
+    session = net.Session(max_per_host=2)
+    with ThreadPoolExecutor(8) as pool:
+        bodies = list(pool.map(lambda _: session.get(f"{server.url}/busy").text, range(8)))
+    session.close()
+    assert bodies == ["busy"] * 8
+    assert server.max_in_flight == 2
+    assert len(server.connections) <= 2
+
+
+def test_stale_pooled_connection_is_retried(server, session):
+    assert session.get(f"{server.url}/close-after").text == "once"
+    time.sleep(0.1)
+    assert session.get(f"{server.url}/item").text == "/item"
+
+
+def test_truncated_body_raises_oserror(server, session):
+    with pytest.raises(OSError):
+        session.get(f"{server.url}/truncated")
+
+
+def test_corrupt_deflate_raises_oserror(server, session):
+    with pytest.raises(OSError):
+        session.get(f"{server.url}/bad-deflate")
+
+
+def test_authorization_kept_on_same_host_redirect(server, session):
+    response = session.get(f"{server.url}/redirect", headers={"Authorization": "Bearer x", "X-Target": "127.0.0.1"})
+    assert response.text == "Bearer x"
+
+
+def test_authorization_dropped_on_cross_host_redirect(server, session):
+    response = session.get(f"{server.url}/redirect", headers={"Authorization": "Bearer x", "X-Target": "localhost"})
+    assert response.text == "none"
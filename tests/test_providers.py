@@ -0,0 +1,58 @@
+"""Concurrent provider runs in resources.lib.providers.iter_sources."""
+import threading
+import time
+
+from resources.lib import providers
+
+
+def scraper(name, delay, state):
+    def scrape(query, media_type, use_rd):
+        with state["lock"]:
+            state["running"] += 1
+            state["most"] = max(state["most"], state["running"])
+            state["threads"] = max(state["threads"], threading.active_count())
+        time.sleep(delay)
+        with state["lock"]:
+            state["running"] -= 1
+        return [{"label": f"{name} 1080p", "url": f"https://host.example/{name}"}]
+    return name, scrape
+
+
+def new_state():
+    return {"lock": threading.Lock(), "running": 0, "most": 0, "threads": 0}
+
+
+def test_at_most_threads_providers_run_at_once():
+    state = new_state()
+    scrapers = [scraper(f"p{index}", 0.1, state) for index in range(6)]
+    threads_before = threading.active_count()
+    found = list(providers.iter_sources(scrapers, "q", "movie", False, 5, threads=2))
+    assert sorted(source["provider"] for _, _, source in found) == [f"p{index}" for index in range(6)]
+    assert state["most"] == 2
+    assert [done for done, _, _ in found][-1] == 6
+    assert state["threads"] <= threads_before + 2  # a fixed pool, not a thread per provider
+
+
+def test_a_timed_out_provider_is_abandoned_but_keeps_its_worker():
+    state = new_state()
+    scrapers = [scraper("hung", 3, state), scraper("fast", 0, state), scraper("queued", 0, state)]
+    started = time.monotonic()
+    found = list(providers.iter_sources(scrapers, "q", "movie", False, 1, threads=2))
+    assert time.monotonic() - started < 2.5
+    assert sorted(source["provider"] for _, _, source in found) == ["fast", "queued"]
+    assert state["most"] <= 2
+
+
+def test_closing_early_drops_queued_providers():
+    state = new_state()
+    calls = []
+
+    def counted(name):
+        name, scrape = scraper(name, 0.05, state)
+        return name, lambda *args: calls.append(name) or scrape(*args)
+
+    stream = providers.iter_sources([counted(f"p{index}") for index in range(10)], "q", "movie", False, 5, threads=1)
+    next(stream)
+    stream.close()
+    time.sleep(0.2)
+    assert len(calls) <= 2
@@ -0,0 +1,23 @@
+"""Release-name parsing and ranking of sources."""
+from resources.lib import ranking
+
+
+def test_size_glued_to_its_unit():
+    source = ranking.parse_source({"label": "Movie 1080p x265 14GB", "url": "https://host.example/a"})
+    assert (source["resolution"], source["codec"], source["size_gb"]) == (1080, "HEVC", 14.0)
+
+
+def test_ts_in_a_label_is_low_quality():
+    source = ranking.parse_source({"label": "Movie 2023 HDTS", "url": "https://host.example/a.mkv"})
+    assert source["resolution"] == 240
+    source = ranking.parse_source({"label": "Movie TS", "url": "https://host.example/a.mkv"})
+    assert source["resolution"] == 240
+
+
+def test_ts_stream_url_is_not_low_quality():
+    stream = {"label": "Movie", "url": "https://cdn.example/hls/segment.ts"}
+    named = {"label": "Movie", "url": "https://cdn.example/Movie.1080p.WEB/index.ts"}
+    other = {"label": "Movie", "url": "https://cdn.example/movie.mkv"}
+    assert ranking.parse_source(dict(stream))["resolution"] == 0
+    assert ranking.parse_source(dict(named))["resolution"] == 1080
+    assert [s["url"] for s in ranking.rank_sources([other, named])][0] == named["url"]
@@ -1,19 +1,95 @@
 import os
 import re
+import sys
+import json
+import time
+import gzip
+import zlib
+import stat
+import struct
 import zipfile
 import pathlib
+import tempfile
+import select
+import ctypes
+import argparse
+import platform
+import datetime
+import contextlib
+import subprocess
+import urllib.request
 import xml.etree.ElementTree as ET
 import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+import xbt
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed for --optimize-images
+    Image = None
 
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 ADDONS = ROOT / "addons"
 REPO = ROOT / "repository.aurion"
 DOCS = ROOT / "docs"
 ZIPS = DOCS / "zips"
+BUILD_CACHE = ROOT / ".build-cache"
+MANIFEST = BUILD_CACHE / "manifest.json"
+MANIFEST_VERSION = 2
+CHECKSUM_ALGORITHMS = ("md5", "sha256")
+CHECKSUM_INDEX = DOCS / "checksums.json"
+TEXTURE_CACHE = BUILD_CACHE / "textures"
+TEXTURE_CACHE_VERSION = 1  # bump when xbt.encode_texture output changes
+XBT_CACHE = BUILD_CACHE / "xbt"
+IMAGE_CACHE = BUILD_CACHE / "images"
+IMAGE_DIRS = ("extras",)  # skin folders whose images are resampled by --optimize-images
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+IMAGE_QUALITY = 85
+XML_CACHE = BUILD_CACHE / "xml"
+XML_DIRS = ("xml",)  # skin folders whose XML is minified by --minify-xml
+ASSET_INDEX = BUILD_CACHE / "assets.json"
+DEDUPE_CACHE = BUILD_CACHE / "dedupe"
+DEDUPE_DIRS = ("media", "extras")  # skin folders whose duplicates --dedupe-assets may drop
+TEXT_EXTENSIONS = (".xml", ".py")
+PROFILE = BUILD_CACHE / "profile.json"
+BYTECODE_DIR = "__pycache__"  # Python writes these next to the sources; never shipped
+BYTECODE_EXTENSIONS = (".pyc", ".pyo")
+
+# Watch mode
+WATCH_DEBOUNCE = 0.3     # seconds of quiet before a burst of edits is rebuilt
+WATCH_POLL = 1.0         # mtime polling interval when inotify isn't available
+WATCH_IGNORE = re.compile(r"(^\.|~$|\.sw[a-p]$|\.tmp$|^\d+$)")  # editor swap/backup files
+LARGE_MEMBER = 1 << 20   # files at least this big get their own compression task
+BATCH_BYTES = 4 << 20    # smaller files are batched up to roughly this many bytes
+WORKER_CPU_S = 0.0       # CPU seconds pool workers spent on tasks this process collected
+ZIP_CREATE_VERSION = (3 << 8) | 20  # "made by" Unix, zip spec 2.0
+
+# Formats that are already compressed; deflating them again costs CPU
+# (at build time and on extraction) for next to no size gain.
+STORED_EXTENSIONS = (
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".ttf", ".otf", ".xbt",
+    ".zip", ".gz", ".mp3", ".ogg", ".mp4",
+)
+DEFLATE_LEVEL = 6
+DELTA_ADDONS = ("skin.aurion",)  # addons that get per-file manifests and delta bundles
+DELTA_VERSIONS = 3
+PAGES_ZIPS_URL = "https://outrageousbean.github.io/Aurion/zips/"  # docs/zips as the deployed site serves it
+RELEASE_VERSION = re.compile(r"^[0-9A-Za-z][0-9A-Za-z.+~_-]*$")  # safe in a file name
+KEEP_VERSIONS = 5  # releases kept per addon in docs/zips (0 = keep all)
+
+# Reproducible archives use one timestamp for every member: SOURCE_DATE_EPOCH
+# when set (see reproducible-builds.org), otherwise the zip epoch.
+FIXED_DATE_TIME = (
+    time.gmtime(int(os.environ["SOURCE_DATE_EPOCH"]))[:6]
+    if os.environ.get("SOURCE_DATE_EPOCH") else (1980, 1, 1, 0, 0, 0)
+)
 
-def write_file(path: pathlib.Path, content: str):
+def write_file(path: pathlib.Path, content: str) -> int:
     path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(content, encoding="utf-8")
+    data = content.encode("utf-8")
+    path.write_bytes(data)
+    return len(data)
 
 def get_addon_info(addon_path):
     xml = addon_path / "addon.xml"
@@ -21,40 +97,1084 @@ def get_addon_info(addon_path):
     elem = tree.getroot()
     return elem.attrib['id'], elem.attrib['version']
 
-def zip_addon(addon_path, out_dir):
+def zip_path_for(addon_id, version, out_dir):
+    return out_dir / addon_id / f"{addon_id}-{version}.zip"
+
+def iter_addon_files(addon_path):
+    """Yield (file_path, rel_path) for every file in an addon folder, skipping Python bytecode."""
+    for folder, dirs, files in os.walk(addon_path):
+        dirs[:] = [d for d in dirs if d != BYTECODE_DIR]
+        rel_folder = pathlib.Path(folder).relative_to(addon_path)
+        for file in files:
+            if not file.endswith(BYTECODE_EXTENSIONS):
+                yield pathlib.Path(folder) / file, (rel_folder / file).as_posix()
+
+def addon_members(addon_path, overlay=None):
+    """
+    Yield (file_path, rel_path) for everything shipped in an addon's zip:
+    its own files minus overlay["exclude"] prefixes, with generated files
+    from overlay["replace"] ({rel_path: file_path}) swapped in or added.
+    """
+    overlay = overlay or {}
+    replace = overlay.get("replace", {})
+    exclude = tuple(overlay.get("exclude", ()))
+    for file_path, rel_path in iter_addon_files(addon_path):
+        if rel_path not in replace and not rel_path.startswith(exclude):
+            yield file_path, rel_path
+    for rel_path, file_path in sorted(replace.items()):
+        yield pathlib.Path(file_path), rel_path
+
+def make_policy(level=DEFLATE_LEVEL, extra_stored=(), reproducible=True):
+    """
+    Archive policy: extensions to store as-is, the deflate level for the
+    rest, and whether to pin timestamps and permissions.
+    """
+    stored = {ext.lower() if ext.startswith(".") else "." + ext.lower()
+              for ext in STORED_EXTENSIONS + tuple(extra_stored)}
+    return {"store": sorted(stored), "level": level, "reproducible": reproducible}
+
+def member_category(path):
+    return pathlib.PurePath(path).suffix.lower() or "(none)"
+
+def compress_member(file_path, policy):
+    """
+    Read one file and compress it according to policy. Returns
+    (crc, size, method, payload, seconds). Files that don't shrink under
+    deflate are stored.
+    """
+    started = time.perf_counter()
+    data = pathlib.Path(file_path).read_bytes()
+    method, payload = zipfile.ZIP_STORED, data
+    if member_category(file_path) not in policy["store"] and policy["level"] > 0:
+        compressor = zlib.compressobj(policy["level"], zlib.DEFLATED, -15)
+        deflated = compressor.compress(data) + compressor.flush()
+        if len(deflated) < len(data):
+            method, payload = zipfile.ZIP_DEFLATED, deflated
+    crc = zlib.crc32(data)
+    return crc, len(data), method, payload, time.perf_counter() - started
+
+def compress_batch(file_paths, policy):
+    return [compress_member(path, policy) for path in file_paths]
+
+def batch_members(entries):
+    """
+    Group (file_path, arc_path, stat) entries into compression tasks:
+    large files get a task of their own, small ones are batched so the
+    pool isn't flooded with tiny jobs.
+    """
+    batches, current, current_bytes = [], [], 0
+    for file_path, _, st in entries:
+        if st.st_size >= LARGE_MEMBER:
+            if current:
+                batches.append(current)
+                current, current_bytes = [], 0
+            batches.append([str(file_path)])
+            continue
+        current.append(str(file_path))
+        current_bytes += st.st_size
+        if current_bytes >= BATCH_BYTES:
+            batches.append(current)
+            current, current_bytes = [], 0
+    if current:
+        batches.append(current)
+    return batches
+
+def dos_datetime(date_time):
+    year, month, day, hour, minute, second = date_time
+    if year < 1980:
+        return 0, (1 << 5) | 1  # 1980-01-01
+    dos_time = (hour << 11) | (minute << 5) | (second // 2)
+    dos_date = ((year - 1980) << 9) | (month << 5) | day
+    return dos_time, dos_date
+
+def member_attributes(st, policy):
+    """Return (date_time, mode) for a member, pinned when the policy is reproducible."""
+    if not policy["reproducible"]:
+        return time.localtime(st.st_mtime)[:6], st.st_mode
+    executable = st.st_mode & 0o111
+    return FIXED_DATE_TIME, stat.S_IFREG | (0o755 if executable else 0o644)
+
+class HashingWriter:
+    """Write-through file wrapper that hashes bytes as they go out."""
+
+    def __init__(self, f, algorithms=CHECKSUM_ALGORITHMS):
+        self.f = f
+        self.offset = 0
+        self.hashes = {name: hashlib.new(name) for name in algorithms}
+
+    def write(self, data):
+        self.f.write(data)
+        self.offset += len(data)
+        for digest in self.hashes.values():
+            digest.update(data)
+
+    def tell(self):
+        return self.offset
+
+    def hexdigests(self):
+        return {name: digest.hexdigest() for name, digest in self.hashes.items()}
+
+    def checksums(self):
+        """Size and hex digests, as stored in the checksum index."""
+        return dict(self.hexdigests(), size=self.offset)
+
+def write_checksum_sidecar(path, algorithm, hexdigest):
+    """Write <path>.<algorithm> in the `sha256sum`/`md5sum` format."""
+    sidecar = path.with_name(f"{path.name}.{algorithm}")
+    sidecar.write_text(f"{hexdigest}  {path.name}\n", encoding="utf-8")
+    return sidecar
+
+def write_zip(out_path, members):
+    """
+    Write a zip from precompressed members, in the order given, plus
+    .md5 and .sha256 sidecars hashed from the same bytes. members yields
+    (arc_path, date_time, mode, crc, size, method, payload). Returns the
+    archive's checksums ({"size", "md5", "sha256"}).
+    """
+    central = []
+    tmp_path = out_path.with_name(out_path.name + ".part")
+    with open(tmp_path, "wb") as raw:
+        f = HashingWriter(raw)
+        for arc_path, date_time, mode, crc, size, method, payload in members:
+            name = arc_path.encode("utf-8")
+            flags = 0 if name.isascii() else 0x800
+            dos_time, dos_date = dos_datetime(date_time)
+            offset = f.tell()
+            if max(offset, size, len(payload)) > 0xFFFFFFFF or len(central) >= 0xFFFF:
+                raise ValueError(f"{out_path.name} is too large for a non-zip64 archive")
+            f.write(struct.pack("<4s5H3L2H", b"PK\x03\x04", 20, flags, method,
+                                dos_time, dos_date, crc, len(payload), size, len(name), 0))
+            f.write(name)
+            f.write(payload)
+            central.append(struct.pack("<4s6H3L5H2L", b"PK\x01\x02", ZIP_CREATE_VERSION, 20,
+                                       flags, method, dos_time, dos_date, crc, len(payload),
+                                       size, len(name), 0, 0, 0, 0,
+                                       (mode & 0xFFFF) << 16, offset) + name)
+        cd_offset = f.tell()
+        for record in central:
+            f.write(record)
+        cd_size = f.tell() - cd_offset
+        f.write(struct.pack("<4s4H2LH", b"PK\x05\x06", 0, 0, len(central), len(central),
+                            cd_size, cd_offset, 0))
+    os.replace(tmp_path, out_path)
+    for algorithm, hexdigest in f.hexdigests().items():
+        write_checksum_sidecar(out_path, algorithm, hexdigest)
+    return f.checksums()
+
+def timed_call(fn, *args):
+    """Run fn in a pool worker; returns (worker CPU seconds, result) so the parent can count it."""
+    cpu = time.process_time()
+    result = fn(*args)
+    return time.process_time() - cpu, result
+
+def worker_result(future):
+    """The result of a timed_call future, adding its CPU time to WORKER_CPU_S."""
+    global WORKER_CPU_S
+    cpu, result = future.result()
+    WORKER_CPU_S += cpu
+    return result
+
+def pool_map(executor, fn, *iterables):
+    """map fn over iterables, in executor's workers when given (submitting every call at once)."""
+    if executor is None:
+        return map(fn, *iterables)
+    return map(worker_result, [executor.submit(timed_call, fn, *args) for args in zip(*iterables)])
+
+def queue_zip(addon_path, out_dir, policy, executor=None, overlay=None):
+    """
+    Collect an addon's files in archive order and, when an executor is
+    given, submit their compression to it straight away. Returns a job
+    for assemble_zip.
+    """
     addon_id, version = get_addon_info(addon_path)
-    # Create zip in addon_id subdirectory
-    out_path = out_dir / addon_id / f"{addon_id}-{version}.zip"
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Create zip with addon files in correct structure
-    with zipfile.ZipFile(out_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for folder, _, files in os.walk(addon_path):
-            rel_path = pathlib.Path(folder).relative_to(addon_path)
-            zip_folder = pathlib.Path(addon_id) / rel_path
-            for file in files:
-                file_path = pathlib.Path(folder) / file
-                arc_path = zip_folder / file
+    entries = sorted(
+        ((file_path, f"{addon_id}/{rel_path}", file_path.stat())
+         for file_path, rel_path in addon_members(addon_path, overlay)),
+        key=lambda entry: entry[1],
+    )
+    batches = batch_members(entries)
+    if executor is not None:
+        batches = [executor.submit(timed_call, compress_batch, batch, policy) for batch in batches]
+    return {
+        "addon_id": addon_id,
+        "version": version,
+        "out_path": zip_path_for(addon_id, version, out_dir),
+        "entries": entries,
+        "batches": batches,
+        "policy": policy,
+    }
+
+def assemble_zip(job, report=None, verbose=True):
+    """
+    Write a queued addon zip, waiting on its compression tasks in order.
+    Per-extension time and sizes are added to report when given. Returns
+    (addon_id, version, checksums).
+    """
+    def members():
+        results = (
+            result
+            for batch in job["batches"]
+            for result in (worker_result(batch) if hasattr(batch, "result")
+                           else compress_batch(batch, job["policy"]))
+        )
+        for (file_path, arc_path, st), compressed in zip(job["entries"], results):
+            if verbose:
                 print(f"Adding {file_path} as {arc_path}")
-                zipf.write(file_path, arc_path)
-    
-    return addon_id, version
+            crc, size, method, payload, seconds = compressed
+            if report is not None:
+                add_to_report(report, member_category(arc_path), method, size, len(payload), seconds)
+            date_time, mode = member_attributes(st, job["policy"])
+            yield arc_path, date_time, mode, crc, size, method, payload
+
+    job["out_path"].parent.mkdir(parents=True, exist_ok=True)
+    checksums = write_zip(job["out_path"], members())
+    return job["addon_id"], job["version"], checksums
+
+def zip_addon(addon_path, out_dir, policy=None, executor=None):
+    return assemble_zip(queue_zip(addon_path, out_dir, policy or make_policy(), executor))
+
+def add_to_report(report, category, method, size_in, size_out, seconds):
+    row = report.setdefault(category, {"files": 0, "stored": 0, "in": 0, "out": 0, "seconds": 0.0})
+    row["files"] += 1
+    row["stored"] += method == zipfile.ZIP_STORED
+    row["in"] += size_in
+    row["out"] += size_out
+    row["seconds"] += seconds
+
+def print_compression_report(report):
+    """Print time spent and bytes saved per file extension, biggest input first."""
+    if not report:
+        return
+    print("Compression report:")
+    print(f"  {'ext':<8} {'files':>6} {'stored':>6} {'in KB':>10} {'out KB':>10} {'saved':>7} {'cpu s':>7}")
+    rows = sorted(report.items(), key=lambda item: item[1]["in"], reverse=True)
+    total = {"files": 0, "stored": 0, "in": 0, "out": 0, "seconds": 0.0}
+    for category, row in rows + [("total", total)]:
+        if category != "total":
+            for key in total:
+                total[key] += row[key]
+        saved = 100.0 * (row["in"] - row["out"]) / row["in"] if row["in"] else 0.0
+        print(f"  {category:<8} {row['files']:>6} {row['stored']:>6} {row['in'] / 1024:>10.0f} "
+              f"{row['out'] / 1024:>10.0f} {saved:>6.1f}% {row['seconds']:>7.2f}")
+
+def load_manifest():
+    """Load the incremental build manifest, or an empty one if missing/stale."""
+    try:
+        data = json.loads(MANIFEST.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"version": MANIFEST_VERSION, "addons": {}}
+    if data.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "addons": {}}
+    return data
+
+def save_manifest(manifest):
+    MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    tmp = MANIFEST.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, MANIFEST)
+
+def record_checksums(manifest, path, checksums):
+    """Remember an output's checksums for the index, keyed by its path under docs/."""
+    manifest.setdefault("checksums", {})[path.relative_to(DOCS).as_posix()] = checksums
+
+def write_checksum_index(manifest):
+    """
+    Write docs/checksums.json from the checksums recorded as outputs were
+    written, dropping outputs that are no longer on disk. Returns the
+    number of files listed.
+    """
+    recorded = manifest.setdefault("checksums", {})
+    for rel in [rel for rel in recorded if not (DOCS / rel).exists()]:
+        del recorded[rel]
+    write_file(CHECKSUM_INDEX, json.dumps({"files": recorded}, indent=1, sort_keys=True))
+    return len(recorded)
+
+def hash_file(path, algorithm="sha256"):
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_addon_files(addon_path, previous=None, overlay=None):
+    """
+    Return {rel_path: [size, mtime_ns, sha256]} for the files an addon
+    ships (see addon_members).
+    Files whose size and mtime match the previous manifest entry reuse
+    the stored hash instead of being read again.
+    """
+    previous = previous or {}
+    files = {}
+    for file_path, rel_path in addon_members(addon_path, overlay):
+        st = file_path.stat()
+        old = previous.get(rel_path)
+        if old and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+            files[rel_path] = old
+        else:
+            files[rel_path] = [st.st_size, st.st_mtime_ns, hash_file(file_path)]
+    return files
+
+def same_content(old_files, new_files):
+    if old_files.keys() != new_files.keys():
+        return False
+    return all(old_files[k][2] == new_files[k][2] for k in new_files)
+
+def check_addon(addon_path, out_dir, manifest, policy, force=False, overlay=None):
+    """
+    Compare an addon against the manifest. Returns (addon_id, version,
+    files, unchanged); unchanged means the addon.xml version, file hashes
+    and compression policy match and the previous zip is still on disk.
+    """
+    addon_id, version = get_addon_info(addon_path)
+    entry = manifest["addons"].get(addon_id, {})
+    files = hash_addon_files(addon_path, entry.get("files"), overlay)
+    out_path = zip_path_for(addon_id, version, out_dir)
+    unchanged = (not force and entry.get("version") == version and out_path.exists()
+                 and all(out_path.with_name(f"{out_path.name}.{algorithm}").exists()
+                         for algorithm in CHECKSUM_ALGORITHMS)
+                 and entry.get("policy") == policy
+                 and same_content(entry.get("files", {}), files))
+    if unchanged:
+        entry["files"] = files
+    return addon_id, version, files, unchanged
+
+def record_addon(manifest, addon_id, version, files, out_dir, policy):
+    manifest["addons"][addon_id] = {
+        "version": version,
+        "policy": policy,
+        "zip": zip_path_for(addon_id, version, out_dir).relative_to(ROOT).as_posix(),
+        "files": files,
+    }
+
+def build_addons(addon_paths, out_dir, manifest, policy, force=False, executor=None, report=None,
+                 overlays=None, verbose=True):
+    """
+    Zip every changed addon. With an executor, all addons' compression
+    tasks are queued up front so they run concurrently, then each archive
+    is assembled in turn. overlays maps addon folder names to
+    addon_members overlays. Returns [(addon_id, version, rebuilt)].
+    """
+    overlays = overlays or {}
+    results, queued = [], []
+    for addon_path in addon_paths:
+        try:
+            overlay = overlays.get(addon_path.name)
+            addon_id, version, files, unchanged = check_addon(addon_path, out_dir, manifest, policy,
+                                                              force, overlay)
+            if unchanged:
+                results.append((addon_id, version, False))
+            else:
+                job = queue_zip(addon_path, out_dir, policy, executor, overlay)
+                queued.append((addon_path, files, job))
+        except Exception as e:
+            # Log and continue so addons.xml/MD5 still regenerate
+            print(f"Warning: failed to build {addon_path.name}: {e}")
+
+    for addon_path, files, job in queued:
+        try:
+            addon_id, version, checksums = assemble_zip(job, report, verbose)
+            record_addon(manifest, addon_id, version, files, out_dir, policy)
+            record_checksums(manifest, job["out_path"], checksums)
+            results.append((addon_id, version, True))
+        except Exception as e:
+            print(f"Warning: failed to build {addon_path.name}: {e}")
+    return results
+
+def texture_frame(source, sha256):
+    """
+    XBT frame for one source image, cached under .build-cache/textures by
+    content hash so unchanged images are never decoded or packed again.
+    """
+    cache_path = TEXTURE_CACHE / f"{sha256}.v{TEXTURE_CACHE_VERSION}.frame"
+    try:
+        data = cache_path.read_bytes()
+        width, height, fmt, unpacked_size = struct.unpack_from("<IIIQ", data)
+        return width, height, fmt, unpacked_size, data[20:]
+    except (OSError, struct.error):
+        pass
+    width, height, fmt, unpacked_size, payload = xbt.encode_texture(pathlib.Path(source).read_bytes())
+    # Write whole or not at all: a torn frame would still unpack and ship corrupt
+    tmp_path = cache_tmp_path(cache_path)
+    tmp_path.write_bytes(struct.pack("<IIIQ", width, height, fmt, unpacked_size) + payload)
+    os.replace(tmp_path, cache_path)
+    return width, height, fmt, unpacked_size, payload
+
+def git_last_change(path):
+    """
+    Commit time of the last change to path, or None when git can't tell
+    (not a checkout, or path has uncommitted edits).
+    """
+    try:
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", str(path)], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        changed = subprocess.run(["git", "log", "-1", "--format=%ct", "--", str(path)], cwd=ROOT,
+                                 capture_output=True, text=True, check=True).stdout.strip()
+        return int(changed) if changed and not dirty else None
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+def prebuilt_is_current(prebuilt, theme):
+    """
+    Whether no source in a theme folder changed since its prebuilt bundle
+    was built: by git history when both are committed, else by mtime.
+    """
+    built, changed = git_last_change(prebuilt), git_last_change(theme)
+    if built is not None and changed is not None:
+        return changed <= built
+    newest = max((path.stat().st_mtime for path, _ in iter_addon_files(theme)), default=0)
+    return newest <= prebuilt.stat().st_mtime
+
+def pack_textures(addon_path, executor=None, stats=None):
+    """
+    Pack each themes/<name>/ folder of a skin into a media/<name>.xbt
+    bundle under the build cache, repacking only when a source image
+    changed. The prebuilt media/<name>.xbt is kept when its sources
+    haven't changed since it was built or when it is smaller than the
+    repacked bundle. Returns an addon_members overlay that ships any
+    repacked bundles in place of the prebuilt ones and leaves the loose
+    theme sources (which Kodi never reads) out of the zip. Source files
+    and bytes and shipped bundle bytes are added to stats when given.
+    """
+    addon_id, _ = get_addon_info(addon_path)
+    overlay = {"replace": {}, "exclude": []}
+    themes = addon_path / "themes"
+    if not themes.is_dir():
+        return overlay
+    for theme in sorted(p for p in themes.iterdir() if p.is_dir()):
+        prebuilt = addon_path / "media" / f"{theme.name}.xbt"
+        if prebuilt.exists() and prebuilt_is_current(prebuilt, theme):
+            print(f"Keeping prebuilt media/{theme.name}.xbt ({prebuilt.stat().st_size / 1024:.0f} KB), "
+                  f"themes/{theme.name} unchanged since it was built")
+            overlay["exclude"].append(f"themes/{theme.name}/")
+            if stats is not None:
+                sizes = [path.stat().st_size for path, _ in iter_addon_files(theme)]
+                stats["files"] += len(sizes)
+                stats["bytes_in"] += sum(sizes)
+                stats["bytes_out"] += prebuilt.stat().st_size
+            continue
+        out_path = XBT_CACHE / addon_id / f"{theme.name}.xbt"
+        state_path = out_path.with_suffix(".json")
+        sources = {rel: hash_file(path) for path, rel in iter_addon_files(theme)}
+        try:
+            unchanged = json.loads(state_path.read_text(encoding="utf-8")) == sources
+        except (OSError, ValueError):
+            unchanged = False
+        if not unchanged or not out_path.exists():
+            rels = sorted(sources)
+            args = ([theme / rel for rel in rels], [sources[rel] for rel in rels])
+            try:
+                frames = list(pool_map(executor, texture_frame, *args))
+            except (OSError, ValueError, zlib.error) as e:
+                print(f"Warning: keeping prebuilt media/{theme.name}.xbt, cannot pack {theme}: {e}")
+                continue
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            xbt.write_xbt(out_path, [(rel,) + frame for rel, frame in zip(rels, frames)])
+            write_file(state_path, json.dumps(sources, indent=1, sort_keys=True))
+            print(f"Packed {len(rels)} textures from themes/{theme.name} into media/{theme.name}.xbt")
+        size = out_path.stat().st_size
+        old_size = prebuilt.stat().st_size if prebuilt.exists() else None
+        if old_size is None:
+            print(f"  media/{theme.name}.xbt: {size / 1024:.0f} KB, no prebuilt bundle")
+        else:
+            print(f"  media/{theme.name}.xbt: {size / 1024:.0f} KB repacked vs {old_size / 1024:.0f} KB prebuilt "
+                  f"({(size - old_size) / 1024:+.0f} KB)")
+        if old_size is not None and size > old_size:
+            print(f"  Keeping the smaller prebuilt media/{theme.name}.xbt")
+            shipped = prebuilt
+        else:
+            overlay["replace"][f"media/{theme.name}.xbt"] = out_path
+            shipped = out_path
+        overlay["exclude"].append(f"themes/{theme.name}/")
+        if stats is not None:
+            stats["files"] += len(sources)
+            stats["bytes_in"] += sum((theme / rel).stat().st_size for rel in sources)
+            stats["bytes_out"] += shipped.stat().st_size
+    return overlay
+
+def skin_resolution(addon_path):
+    """The default <res> a skin declares in addon.xml, as (width, height)."""
+    tree = ET.parse(addon_path / "addon.xml")
+    resolutions = tree.getroot().findall(".//extension[@point='xbmc.gui.skin']/res")
+    for res in resolutions:
+        if res.get("default") == "true":
+            return int(res.get("width")), int(res.get("height"))
+    return 1920, 1080
+
+def cache_tmp_path(cache_path):
+    """
+    A fresh temp file beside cache_path to write it through and then
+    os.replace into place, unique so concurrent workers never share one.
+    """
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=cache_path.parent, prefix=cache_path.name + ".", suffix=".part")
+    os.close(fd)
+    return pathlib.Path(tmp)
+
+def optimize_image(source, sha256, max_size, quality):
+    """
+    Downscale an image to fit max_size and recompress it, caching the
+    result under .build-cache/images keyed by source hash and settings.
+    Returns (cache_path, error); PNGs stay lossless.
+    """
+    source = pathlib.Path(source)
+    width, height = max_size
+    cache_path = IMAGE_CACHE / f"{sha256}-{width}x{height}-q{quality}{source.suffix.lower()}"
+    if cache_path.exists():
+        return str(cache_path), None
+    tmp_path = None
+    try:
+        with Image.open(source) as img:
+            img.load()
+            if img.width > width or img.height > height:
+                img.thumbnail(max_size, Image.LANCZOS)
+            tmp_path = cache_tmp_path(cache_path)
+            if img.format == "JPEG":
+                img.convert("RGB").save(tmp_path, "JPEG", quality=quality, optimize=True)
+            else:
+                img.save(tmp_path, img.format, optimize=True)
+        os.replace(tmp_path, cache_path)
+    except (OSError, ValueError) as e:
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+        return None, str(e)
+    return str(cache_path), None
+
+def optimize_images(addon_path, max_size, quality, executor=None, stats=None):
+    """
+    Resample and recompress the images under IMAGE_DIRS of a skin. Returns
+    an addon_members overlay shipping each optimized copy that came out
+    smaller than its source, and prints the size change per folder (and
+    adds the totals to stats when given).
+    """
+    overlay = {"replace": {}, "exclude": []}
+    images = [
+        (file_path, f"{folder}/{rel_path}")
+        for folder in IMAGE_DIRS if (addon_path / folder).is_dir()
+        for file_path, rel_path in iter_addon_files(addon_path / folder)
+        if member_category(rel_path) in IMAGE_EXTENSIONS
+    ]
+    if not images:
+        return overlay
+    # Byte-identical images share one cache entry, so optimize each only once
+    keys = [(hash_file(p), p.suffix.lower()) for p, _ in images]
+    unique = {}
+    for (file_path, _), key in zip(images, keys):
+        unique.setdefault(key, file_path)
+    args = (list(unique.values()), [sha256 for sha256, _ in unique],
+            [max_size] * len(unique), [quality] * len(unique))
+    results = pool_map(executor, optimize_image, *args)
+    by_key = dict(zip(unique, results))
+
+    per_folder = {}
+    for (source, rel_path), key in zip(images, keys):
+        cache_path, error = by_key[key]
+        if error:
+            print(f"Warning: shipping {rel_path} as-is, cannot optimize it: {error}")
+        size_in = source.stat().st_size
+        size_out = size_in
+        if cache_path and os.path.getsize(cache_path) < size_in:
+            overlay["replace"][rel_path] = pathlib.Path(cache_path)
+            size_out = os.path.getsize(cache_path)
+        folder = "/".join(rel_path.split("/")[:-1][:2])
+        row = per_folder.setdefault(folder, [0, 0, 0])
+        row[0] += 1
+        row[1] += size_in
+        row[2] += size_out
+
+    if stats is not None:
+        stats["files"] += sum(row[0] for row in per_folder.values())
+        stats["bytes_in"] += sum(row[1] for row in per_folder.values())
+        stats["bytes_out"] += sum(row[2] for row in per_folder.values())
+    print(f"Image optimization ({max_size[0]}x{max_size[1]}, quality {quality}):")
+    for folder, (count, size_in, size_out) in sorted(per_folder.items()):
+        saved = 100.0 * (size_in - size_out) / size_in if size_in else 0.0
+        print(f"  {folder:<28} {count:>5} files {size_in / 1024:>9.0f} KB -> "
+              f"{size_out / 1024:>9.0f} KB ({saved:.1f}% saved)")
+    return overlay
+
+def strip_whitespace(element):
+    """
+    Drop indentation: whitespace-only text next to child elements. Text of leaf elements is kept as written, since
+    Kodi reads labels and actions verbatim.
+    """
+    if len(element):
+        if element.text and not element.text.strip():
+            element.text = None
+        for child in element:
+            if child.tail and not child.tail.strip():
+                child.tail = None
+            strip_whitespace(child)
+
+def parse_seconds(data, runs=3):
+    """Best of runs expat parse times for an XML document."""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        ET.fromstring(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def minify_xml(source, sha256):
+    """
+    Strip comments and indentation from one skin XML file, caching the
+    result under .build-cache/xml by source hash. Returns (cache_path,
+    parse_seconds_before, parse_seconds_after, error); error is set
+    when the source is not well-formed.
+    """
+    data = pathlib.Path(source).read_bytes()
+    try:
+        before = parse_seconds(data)
+    except ET.ParseError as e:
+        return None, 0.0, 0.0, str(e)
+    cache_path = XML_CACHE / f"{sha256}.xml"
+    if not cache_path.exists():
+        # ElementTree's default parser already leaves comments out
+        root = ET.fromstring(data)
+        strip_whitespace(root)
+        tmp_path = cache_tmp_path(cache_path)
+        tmp_path.write_bytes(b'<?xml version="1.0" encoding="UTF-8"?>\n'
+                             + ET.tostring(root, encoding="utf-8", xml_declaration=False))
+        os.replace(tmp_path, cache_path)
+    return str(cache_path), before, parse_seconds(cache_path.read_bytes()), None
+
+def minify_skin_xml(addon_path, executor=None, stats=None):
+    """
+    Minify the XML under XML_DIRS of a skin. Returns an addon_members
+    overlay shipping the minified copies, and prints sizes and expat
+    parse times before and after, plus any file that isn't well-formed
+    (those ship unchanged). File and byte totals are added to stats when
+    given.
+    """
+    overlay = {"replace": {}, "exclude": []}
+    sources = [
+        (file_path, f"{folder}/{rel_path}")
+        for folder in XML_DIRS if (addon_path / folder).is_dir()
+        for file_path, rel_path in iter_addon_files(addon_path / folder)
+        if member_category(rel_path) == ".xml"
+    ]
+    if not sources:
+        return overlay
+    # Identical files share one cache entry, so minify each only once
+    hashes = [hash_file(p) for p, _ in sources]
+    unique = {}
+    for (file_path, _), sha256 in zip(sources, hashes):
+        unique.setdefault(sha256, file_path)
+    args = (list(unique.values()), list(unique))
+    results = pool_map(executor, minify_xml, *args)
+    by_hash = dict(zip(unique, results))
+
+    rows = []
+    for (source, rel_path), sha256 in zip(sources, hashes):
+        cache_path, before, after, error = by_hash[sha256]
+        size_in = source.stat().st_size
+        if error:
+            print(f"Warning: {rel_path} is not well-formed, shipping it as-is: {error}")
+            continue
+        size_out = os.path.getsize(cache_path)
+        if size_out < size_in:
+            overlay["replace"][rel_path] = pathlib.Path(cache_path)
+        else:
+            size_out, after = size_in, before
+        rows.append((rel_path, size_in, size_out, before, after))
+
+    total_in, total_out, total_before, total_after = (sum(row[i] for row in rows) for i in range(1, 5))
+    if stats is not None:
+        stats["files"] += len(rows)
+        stats["bytes_in"] += total_in
+        stats["bytes_out"] += total_out
+    print(f"XML minification: {len(rows)} files {total_in / 1024:.0f} KB -> {total_out / 1024:.0f} KB, "
+          f"parse {total_before * 1000:.0f} ms -> {total_after * 1000:.0f} ms")
+    for rel_path, size_in, size_out, before, after in sorted(rows, key=lambda row: -row[1])[:5]:
+        print(f"  {rel_path:<32} {size_in / 1024:>6.0f} KB -> {size_out / 1024:>6.0f} KB, "
+              f"parse {before * 1000:>5.1f} ms -> {after * 1000:>5.1f} ms")
+    return overlay
+
+def asset_index(manifest, addon_ids):
+    """{sha256: [(addon_id, rel_path, size)]} over the files the given addons ship."""
+    index = {}
+    for addon_id in addon_ids:
+        for rel_path, (size, _, sha256) in manifest["addons"].get(addon_id, {}).get("files", {}).items():
+            index.setdefault(sha256, []).append((addon_id, rel_path, size))
+    return index
+
+def report_duplicates(manifest, addon_ids):
+    """
+    Write the content-hash index to .build-cache/assets.json and print
+    files shipped more than once across addons, with the zip bytes the
+    extra copies take and how long extracting them takes here (a proxy
+    for install time on a device).
+    """
+    index = asset_index(manifest, addon_ids)
+    write_file(ASSET_INDEX, json.dumps(index, indent=1, sort_keys=True))
+    groups = sorted((copies for copies in index.values() if len(copies) > 1),
+                    key=lambda copies: -copies[0][2] * (len(copies) - 1))
+    if not groups:
+        print("No duplicate assets.")
+        return
+
+    # Extra copies are every copy after the first; their packed sizes come
+    # from the zips' central directories, so nothing is recompressed
+    extra = {}
+    for copies in groups:
+        for addon_id, rel_path, _ in sorted(copies)[1:]:
+            extra.setdefault(addon_id, []).append(rel_path)
+    raw_bytes = zip_bytes = 0
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        for addon_id, rel_paths in extra.items():
+            version = manifest["addons"][addon_id]["version"]
+            with zipfile.ZipFile(zip_path_for(addon_id, version, ZIPS)) as zf:
+                for i, rel_path in enumerate(rel_paths):
+                    info = zf.getinfo(f"{addon_id}/{rel_path}")
+                    raw_bytes += info.file_size
+                    zip_bytes += info.compress_size
+                    pathlib.Path(tmp, f"{addon_id}-{i}").write_bytes(zf.read(info))
+    seconds = time.perf_counter() - start
 
-def generate_md5(filename):
-    hash_md5 = hashlib.md5()
-    with open(filename, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+    copies = sum(len(paths) for paths in extra.values())
+    print(f"Duplicate assets: {len(groups)} files shipped {copies} extra times, "
+          f"{raw_bytes / 1024:.0f} KB unpacked / {zip_bytes / 1024:.0f} KB zipped, "
+          f"{seconds * 1000:.0f} ms to extract here")
+    for group in groups[:10]:
+        paths = ", ".join(f"{addon_id}/{rel_path}" for addon_id, rel_path, _ in sorted(group))
+        print(f"  {group[0][2] / 1024:>6.1f} KB x{len(group)}  {paths}")
 
-def generate_addons_xml():
+def asset_references(rel_path):
+    """Strings a skin's XML can use to name a file under DEDUPE_DIRS."""
+    refs = [f"special://skin/{rel_path}"]
+    if rel_path.startswith("media/"):
+        refs.append(rel_path[len("media/"):])
+    return refs
+
+def dedupe_skin_assets(addon_path, overlay=None):
+    """
+    Point XML references to duplicated files under DEDUPE_DIRS at one
+    canonical copy, and leave the other copies out of the zip. A copy is
+    only dropped when it was referenced literally and its file name no
+    longer appears in any shipped XML/Python afterwards, so images built
+    from $INFO/$VAR names (weather codes, flags) are always kept. Theme
+    textures are left alone: each theme may override the same names, and
+    --pack-textures already stores identical frames once. Returns an
+    overlay to merge over the given one.
+    """
+    addon_id, _ = get_addon_info(addon_path)
+    result = {"replace": {}, "exclude": []}
+    members = dict((rel, path) for path, rel in addon_members(addon_path, overlay))
+    by_hash = {}
+    for rel_path, path in sorted(members.items()):
+        if rel_path.startswith(tuple(f"{d}/" for d in DEDUPE_DIRS)):
+            by_hash.setdefault(hash_file(path), []).append(rel_path)
+    renames = {}
+    for copies in by_hash.values():
+        for rel_path in copies[1:]:
+            for old, new in zip(asset_references(rel_path), asset_references(copies[0])):
+                renames[old] = (new, rel_path)
+    if not renames:
+        return result
+
+    token = re.compile(r"(?<![\w./-])(" + "|".join(map(re.escape, sorted(renames, key=len, reverse=True)))
+                       + r")(?![\w./-])")
+    texts, referenced = {}, set()
+    for rel_path, path in members.items():
+        if member_category(rel_path) not in TEXT_EXTENSIONS:
+            continue
+        text = path.read_text(encoding="utf-8", errors="surrogateescape")
+        if member_category(rel_path) == ".xml":
+            rewritten = token.sub(lambda m: renames[m.group(1)][0], text)
+            referenced.update(renames[ref][1] for ref in token.findall(text))
+            if rewritten != text:
+                cache_path = DEDUPE_CACHE / addon_id / rel_path
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                cache_path.write_text(rewritten, encoding="utf-8", errors="surrogateescape")
+                result["replace"][rel_path] = cache_path
+                text = rewritten
+        texts[rel_path] = text
+    corpus = "\n".join(texts.values())
+    dropped = [rel_path for rel_path in sorted(referenced)
+               if pathlib.PurePosixPath(rel_path).name not in corpus]
+    result["exclude"] = dropped
+    saved = sum(members[rel_path].stat().st_size for rel_path in dropped)
+    print(f"Deduplicated {addon_id}: {len(result['replace'])} XML files rewritten, "
+          f"{len(dropped)} duplicate files dropped ({saved / 1024:.0f} KB)")
+    return result
+
+def merge_overlays(*overlays):
+    merged = {"replace": {}, "exclude": []}
+    for overlay in overlays:
+        merged["replace"].update(overlay.get("replace", {}))
+        merged["exclude"].extend(overlay.get("exclude", ()))
+    return merged
+
+def version_key(version):
+    """Sort key for addon versions such as 21.2.2+omega.44."""
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part)
+            for part in re.split(r"[.+\-~]", version) if part]
+
+def published_versions(addon_dir, addon_id):
+    """
+    Versions that have a full zip or a .files.json in docs/zips/<addon_id>/,
+    oldest first.
+    """
+    prefix = f"{addon_id}-"
+    versions = {
+        p.name[len(prefix):-len(".zip")]
+        for p in addon_dir.glob(f"{prefix}*.zip")
+        if not p.name.endswith(".delta.zip")
+    }
+    versions |= {p.name[len(prefix):-len(".files.json")] for p in addon_dir.glob(f"{prefix}*.files.json")}
+    return sorted(versions, key=version_key)
+
+def fetch_json(url, timeout=30):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+def fetch_release_manifests(base_url, addon_ids, out_dir, depth):
+    """
+    Download the .files.json of the newest depth releases the live site
+    lists in each addon's deltas.json into out_dir/<addon_id>/. A build from
+    a clean checkout (as in CI, where Pages is replaced on every deploy)
+    then still has the releases to publish deltas from, and publishes those
+    manifests again for the next build. Returns how many were fetched.
+    """
+    total = 0
+    for addon_id in addon_ids:
+        fetched = 0
+        addon_url = f"{base_url.rstrip('/')}/{addon_id}/"
+        try:
+            index = fetch_json(addon_url + "deltas.json")
+            versions = sorted(set(index["deltas"]) | {index["version"]}, key=version_key)[-depth:]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Warning: no published releases of {addon_id} at {addon_url}: {e}")
+            continue
+        for version in versions:
+            path = out_dir / addon_id / f"{addon_id}-{version}.files.json"
+            if not RELEASE_VERSION.match(version) or path.exists():
+                continue
+            try:
+                data = fetch_json(f"{addon_url}{path.name}")
+                if (data.get("addon_id"), data.get("version")) != (addon_id, version) \
+                        or not isinstance(data.get("files"), dict):
+                    raise ValueError("not the release manifest it should be")
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"Warning: cannot fetch {path.name}: {e}")
+                continue
+            write_file(path, json.dumps(data, indent=1, sort_keys=True))
+            fetched += 1
+        print(f"Fetched {fetched} published {addon_id} release manifest{'s' if fetched != 1 else ''}")
+        total += fetched
+    return total
+
+def release_files(addon_dir, addon_id, version):
+    """
+    {rel_path: sha256} for a published release, from its .files.json when
+    present, otherwise by hashing the members of its zip.
+    """
+    files_json = addon_dir / f"{addon_id}-{version}.files.json"
+    if files_json.exists():
+        return json.loads(files_json.read_text(encoding="utf-8"))["files"]
+    files = {}
+    prefix = f"{addon_id}/"
+    with zipfile.ZipFile(zip_path_for(addon_id, version, addon_dir.parent)) as zf:
+        for info in zf.infolist():
+            if not info.is_dir() and info.filename.startswith(prefix):
+                files[info.filename[len(prefix):]] = hashlib.sha256(zf.read(info)).hexdigest()
+    return files
+
+def compress_bytes(data, arc_path, policy):
+    """Compress in-memory data for write_zip, pinned like a reproducible member."""
+    level = 0 if member_category(arc_path) in policy["store"] else policy["level"]
+    method, payload = zipfile.ZIP_STORED, data
+    if level > 0:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        deflated = compressor.compress(data) + compressor.flush()
+        if len(deflated) < len(data):
+            method, payload = zipfile.ZIP_DEFLATED, deflated
+    return (arc_path, FIXED_DATE_TIME, stat.S_IFREG | 0o644,
+            zlib.crc32(data), len(data), method, payload)
+
+def write_delta(shipped, addon_dir, addon_id, old_version, old_files, version, files, policy):
+    """
+    Write <id>-<old>-to-<new>.delta.zip holding delta.json plus every file
+    added or changed since old_version under files/. delta.json lists the
+    expected old and new sha256 of each path so clients can verify their
+    tree before and after patching. shipped maps rel paths to the files
+    that went into the release zip. Returns (path, checksums).
+    """
+    changed = {
+        rel: [old_files.get(rel), sha256]
+        for rel, sha256 in sorted(files.items())
+        if old_files.get(rel) != sha256
+    }
+    removed = {rel: old_files[rel] for rel in sorted(old_files) if rel not in files}
+    delta = {
+        "addon_id": addon_id,
+        "from": old_version,
+        "to": version,
+        "changed": changed,
+        "removed": removed,
+    }
+
+    def members():
+        yield compress_bytes(json.dumps(delta, indent=1, sort_keys=True).encode("utf-8"),
+                             "delta.json", policy)
+        for rel in changed:
+            crc, size, method, payload, _ = compress_member(shipped[rel], policy)
+            yield f"files/{rel}", FIXED_DATE_TIME, stat.S_IFREG | 0o644, crc, size, method, payload
+
+    out_path = addon_dir / f"{addon_id}-{old_version}-to-{version}.delta.zip"
+    return out_path, write_zip(out_path, members())
+
+def publish_deltas(addon_path, out_dir, manifest, policy, depth, overlay=None):
+    """
+    Publish <id>-<version>.files.json for the current release, delta
+    bundles from up to depth previous releases, and a deltas.json index
+    the wizard reads to pick a bundle for the installed version.
+    """
+    addon_id, version = get_addon_info(addon_path)
+    addon_dir = out_dir / addon_id
+    files = {rel: entry[2] for rel, entry in manifest["addons"][addon_id]["files"].items()}
+    shipped = {rel: path for path, rel in addon_members(addon_path, overlay)}
+    write_file(addon_dir / f"{addon_id}-{version}.files.json",
+               json.dumps({"addon_id": addon_id, "version": version, "files": files},
+                          indent=1, sort_keys=True))
+
+    older = [v for v in published_versions(addon_dir, addon_id)
+             if version_key(v) < version_key(version)][-depth:] if depth > 0 else []
+    deltas = {}
+    for old_version in older:
+        try:
+            old_files = release_files(addon_dir, addon_id, old_version)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print(f"Warning: no delta from {addon_id} {old_version}: {e}")
+            continue
+        delta_path, checksums = write_delta(shipped, addon_dir, addon_id, old_version,
+                                            old_files, version, files, policy)
+        record_checksums(manifest, delta_path, checksums)
+        deltas[old_version] = {"file": delta_path.name, "sha256": checksums["sha256"],
+                               "size": checksums["size"]}
+        print(f"Delta {old_version} -> {version}: {checksums['size'] / 1024:.0f} KB")
+
+    # Bundles that don't lead to the current release are dead weight
+    for stale in addon_dir.glob(f"{addon_id}-*.delta.zip"):
+        if stale.name not in {d["file"] for d in deltas.values()}:
+            stale.unlink()
+            for algorithm in CHECKSUM_ALGORITHMS:
+                stale.with_name(f"{stale.name}.{algorithm}").unlink(missing_ok=True)
+
+    zip_path = zip_path_for(addon_id, version, out_dir)
+    index = {
+        "addon_id": addon_id,
+        "version": version,
+        "zip": zip_path.name,
+        "sha256": manifest["checksums"][zip_path.relative_to(DOCS).as_posix()]["sha256"],
+        "deltas": deltas,
+    }
+    write_file(addon_dir / "deltas.json", json.dumps(index, indent=1, sort_keys=True))
+
+def prune_versions(addon_id, version, keep):
+    """
+    Delete all but the newest keep releases of an addon from docs/zips,
+    with their checksum sidecars and .files.json. The current version is
+    always kept; delta bundles are left to publish_deltas. Returns the
+    pruned versions.
+    """
+    addon_dir = ZIPS / addon_id
+    if keep <= 0 or not addon_dir.is_dir():
+        return []
+    pruned = [v for v in published_versions(addon_dir, addon_id)[:-keep] if v != version]
+    for old_version in pruned:
+        zip_path = zip_path_for(addon_id, old_version, ZIPS)
+        for path in [zip_path, addon_dir / f"{addon_id}-{old_version}.files.json"] + [
+                zip_path.with_name(f"{zip_path.name}.{algorithm}") for algorithm in CHECKSUM_ALGORITHMS]:
+            path.unlink(missing_ok=True)
+    return pruned
+
+def prune_old_versions(results, keep):
+    """Apply prune_versions to every addon in build_addons results."""
+    for addon_id, version, _ in results:
+        pruned = prune_versions(addon_id, version, keep)
+        if pruned:
+            print(f"Pruned {len(pruned)} old {addon_id} release{'s' if len(pruned) != 1 else ''}: "
+                  f"{', '.join(pruned)}")
+
+def prepare_overlays(skins, args, executor, profile):
+    """Run the opt-in texture, image, XML and dedupe stages for skins; returns their overlays."""
+    overlays = {}
+    if args.pack_textures:
+        print("Packing skin textures...")
+        with profile.phase("textures") as stats:
+            for addon_path in skins:
+                overlays[addon_path.name] = pack_textures(addon_path, executor, stats)
+    if args.optimize_images:
+        print("Optimizing skin images...")
+        with profile.phase("images") as stats:
+            for addon_path in skins:
+                if args.max_image_size:
+                    max_size = tuple(int(v) for v in args.max_image_size.lower().split("x"))
+                else:
+                    max_size = skin_resolution(addon_path)
+                overlay = optimize_images(addon_path, max_size, args.image_quality, executor, stats)
+                overlays[addon_path.name] = merge_overlays(overlays.get(addon_path.name, {}), overlay)
+    if args.minify_xml:
+        print("Minifying skin XML...")
+        with profile.phase("xml") as stats:
+            for addon_path in skins:
+                overlay = minify_skin_xml(addon_path, executor, stats)
+                overlays[addon_path.name] = merge_overlays(overlays.get(addon_path.name, {}), overlay)
+    if args.dedupe_assets:
+        print("Deduplicating skin assets...")
+        with profile.phase("dedupe"):
+            for addon_path in skins:
+                overlay = dedupe_skin_assets(addon_path, overlays.get(addon_path.name))
+                overlays[addon_path.name] = merge_overlays(overlays.get(addon_path.name, {}), overlay)
+    return overlays
+
+def publish_addon_deltas(results, manifest, policy, depth, overlays):
+    """Publish deltas for the DELTA_ADDONS in build_addons results that need them."""
+    for addon_id, version, rebuilt in results:
+        addon_path = ADDONS / addon_id
+        if addon_id not in DELTA_ADDONS or not addon_path.is_dir():
+            continue
+        if rebuilt or not (ZIPS / addon_id / "deltas.json").exists():
+            print(f"Publishing deltas for {addon_id}...")
+            try:
+                publish_deltas(addon_path, ZIPS, manifest, policy, depth, overlays.get(addon_path.name))
+            except Exception as e:
+                print(f"Warning: failed to publish deltas for {addon_id}: {e}")
+
+def addon_xml_fragment(xml_path, fragments=None):
+    """
+    An addon.xml's contents for addons.xml, and how many bytes were read.
+    fragments caches them by path and mtime so a rebuild only re-reads
+    the addon.xml files that changed.
+    """
+    mtime = xml_path.stat().st_mtime_ns
+    cached = (fragments or {}).get(xml_path)
+    if cached and cached[0] == mtime:
+        return cached[1], 0
+    content = xml_path.read_text()
+    size = len(content)
+    # Strip any XML declaration like <?xml ...?> anywhere in the file
+    content = re.sub(r"\s*<\?xml[^>]*\?>", "", content, flags=re.IGNORECASE)
+    content = content.strip()
+    if fragments is not None:
+        fragments[xml_path] = (mtime, content)
+    return content, size
+
+def generate_addons_xml(fragments=None):
+    """
+    Write docs/addons.xml, the addons.xml.gz copy the repository addon
+    points Kodi at, and the .md5 Kodi polls to decide whether to fetch
+    either, all hashed as they are written. Returns (files_read,
+    bytes_in, {path: checksums}).
+    """
     addons = []
+    bytes_in = 0
     # Add repository addon first
     if (REPO / "addon.xml").exists():
-        content = (REPO / "addon.xml").read_text()
-        # Strip any XML declaration like <?xml ...?> anywhere in the file
-        content = re.sub(r"\s*<\?xml[^>]*\?>", "", content, flags=re.IGNORECASE)
-        content = content.strip()
+        content, size = addon_xml_fragment(REPO / "addon.xml", fragments)
+        bytes_in += size
         addons.append(content)
     
     # Add all other addons
@@ -62,30 +1182,37 @@ def generate_addons_xml():
         if addon.is_dir():
             xml_path = addon / "addon.xml"
             if xml_path.exists():
-                content = xml_path.read_text()
-                # Strip any XML declaration like <?xml ...?> anywhere in the file
-                content = re.sub(r"\s*<\?xml[^>]*\?>", "", content, flags=re.IGNORECASE)
-                content = content.strip()
+                content, size = addon_xml_fragment(xml_path, fragments)
+                bytes_in += size
                 addons.append(content)
     
     # Write addons.xml with proper XML declaration
     xml_content = '<?xml version="1.0" encoding="UTF-8"?>\n<addons>\n' + "\n".join(addons) + "\n</addons>"
-    addons_xml = DOCS / "addons.xml"
-    addons_xml.write_text(xml_content, encoding='utf-8')
+    data = xml_content.encode("utf-8")
+    outputs = {}
+    # mtime=0 keeps the .gz byte-identical while addons.xml is unchanged
+    for path, payload in ((DOCS / "addons.xml", data),
+                          (DOCS / "addons.xml.gz", gzip.compress(data, 9, mtime=0))):
+        with open(path, "wb") as raw:
+            f = HashingWriter(raw)
+            f.write(payload)
+        outputs[path] = f.checksums()
     
-    # Generate proper MD5
-    md5_path = DOCS / "addons.xml.md5"
-    md5_hash = generate_md5(addons_xml)
-    md5_path.write_text(md5_hash, encoding='utf-8')
+    # Kodi expects the bare MD5 hex digest of the uncompressed index
+    (DOCS / "addons.xml.md5").write_text(outputs[DOCS / "addons.xml"]["md5"], encoding='utf-8')
+    return len(addons), bytes_in, outputs
 
-def generate_html_index_pages():
+def generate_html_index_pages(listings=None):
         """
         Generate simple HTML directory listings so Kodi can browse HTTP sources.
         Creates:
             - docs/index.html
             - docs/zips/index.html
             - docs/zips/<addon_id>/index.html
+        listings remembers what each page last listed; pages whose listing
+        is unchanged are not rewritten. Returns (pages_written, bytes_written).
         """
+        listings = {} if listings is None else listings
         # docs/index.html
         root_index = f"""
 <!DOCTYPE html>
@@ -176,6 +1303,7 @@ def generate_html_index_pages():
     <h1>Aurion Repository</h1>
     <ul>
         <li><a href=\"addons.xml\">addons.xml</a></li>
+        <li><a href=\"addons.xml.gz\">addons.xml.gz</a></li>
         <li><a href=\"addons.xml.md5\">addons.xml.md5</a></li>
         <li><a href=\"zips/\">zips/</a></li>
     </ul>
@@ -183,7 +1311,11 @@ def generate_html_index_pages():
 </body>
 </html>
 """
-        write_file(DOCS / "index.html", root_index)
+        pages = written = 0
+        if listings.get("index.html") != hashlib.sha256(root_index.encode("utf-8")).hexdigest() \
+                        or not (DOCS / "index.html").exists():
+                pages, written = 1, write_file(DOCS / "index.html", root_index)
+                listings["index.html"] = hashlib.sha256(root_index.encode("utf-8")).hexdigest()
 
         # docs/zips/index.html
         addon_dirs = []
@@ -191,68 +1323,401 @@ def generate_html_index_pages():
                 for item in sorted(ZIPS.iterdir()):
                         if item.is_dir():
                                 addon_dirs.append(item.name)
-        zips_index = [
-                "<!DOCTYPE html>",
-                "<html lang=\"en\"><head><meta charset=\"UTF-8\"><title>zips/</title></head><body>",
-                "<h1>zips/</h1>",
-                "<ul>",
-        ]
-        for name in addon_dirs:
-                zips_index.append(f"  <li><a href=\"{name}/\">{name}/</a></li>")
-        zips_index += [
-                "</ul>",
-                "</body></html>",
-        ]
-        write_file(ZIPS / "index.html", "\n".join(zips_index))
-
-        # docs/zips/<addon_id>/index.html
-        for name in addon_dirs:
-                subdir = ZIPS / name
-                files = [p.name for p in sorted(subdir.iterdir()) if p.is_file()]
-                sub_lines = [
+        if listings.get("zips/index.html") == addon_dirs and (ZIPS / "index.html").exists():
+                zips_index = None
+        else:
+                listings["zips/index.html"] = addon_dirs
+                zips_index = [
                         "<!DOCTYPE html>",
-                        f"<html lang=\"en\"><head><meta charset=\"UTF-8\"><title>{name}/</title></head><body>",
-                        f"<h1>{name}/</h1>",
+                        "<html lang=\"en\"><head><meta charset=\"UTF-8\"><title>zips/</title></head><body>",
+                        "<h1>zips/</h1>",
                         "<ul>",
                 ]
-                for fname in files:
-                        sub_lines.append(f"  <li><a href=\"{fname}\">{fname}</a></li>")
-                sub_lines += [
+                for name in addon_dirs:
+                        zips_index.append(f"  <li><a href=\"{name}/\">{name}/</a></li>")
+                zips_index += [
                         "</ul>",
                         "</body></html>",
                 ]
-                write_file(subdir / "index.html", "\n".join(sub_lines))
+                pages, written = pages + 1, written + write_file(ZIPS / "index.html", "\n".join(zips_index))
+
+        # docs/zips/<addon_id>/index.html
+        for name in addon_dirs:
+                page_bytes = generate_addon_index_page(name, listings)
+                if page_bytes:
+                        pages, written = pages + 1, written + page_bytes
+        return pages, written
 
-def main():
+def generate_addon_index_page(name, listings=None):
+    """
+    Write docs/zips/<addon_id>/index.html listing the release zips; the
+    sidecars, manifests and deltas clients fetch by name are left out to
+    keep the page short. Returns the bytes written, 0 if the listing in
+    listings was already current.
+    """
+    subdir = ZIPS / name
+    files = [p.name for p in sorted(subdir.iterdir())
+             if p.is_file() and p.suffix == ".zip" and not p.name.endswith(".delta.zip")]
+    key = f"zips/{name}/index.html"
+    if listings is not None:
+        if listings.get(key) == files and (subdir / "index.html").exists():
+            return 0
+        listings[key] = files
+    sub_lines = [
+        "<!DOCTYPE html>",
+        f"<html lang=\"en\"><head><meta charset=\"UTF-8\"><title>{name}/</title></head><body>",
+        f"<h1>{name}/</h1>",
+        "<ul>",
+    ]
+    for fname in files:
+        sub_lines.append(f"  <li><a href=\"{fname}\">{fname}</a></li>")
+    sub_lines += [
+        "</ul>",
+        "</body></html>",
+    ]
+    return write_file(subdir / "index.html", "\n".join(sub_lines))
+
+class InotifyWatcher:
+    """Recursive inotify watch over some directory trees, through libc (Linux only)."""
+
+    MASK = 0x2 | 0x4 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200  # modify, attrib, close_write, moves, create, delete
+    IN_ISDIR = 0x40000000
+    IN_Q_OVERFLOW = 0x4000
+
+    def __init__(self, roots):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.roots = roots
+        self.dirs = {}
+        for root in roots:
+            self.add_tree(root)
+
+    def add_tree(self, top):
+        for dirpath, dirnames, _ in os.walk(top):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), self.MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {dirpath}")
+            self.dirs[wd] = pathlib.Path(dirpath)
+
+    def wait(self, timeout=None):
+        """Block up to timeout seconds; returns the set of paths that changed."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        changed = set()
+        data = os.read(self.fd, 1 << 16)
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, length = struct.unpack_from("iIII", data, pos)
+            name = data[pos + 16:pos + 16 + length].rstrip(b"\0")
+            pos += 16 + length
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were dropped; treat every watched tree as changed
+                changed.update(self.roots)
+                continue
+            if wd not in self.dirs or not name:
+                continue
+            path = self.dirs[wd] / os.fsdecode(name)
+            if mask & self.IN_ISDIR and mask & (0x80 | 0x100) and path.is_dir():
+                self.add_tree(path)
+            changed.add(path)
+        return changed
+
+class PollingWatcher:
+    """Fallback watcher that compares file sizes and mtimes every WATCH_POLL seconds."""
+
+    def __init__(self, roots):
+        self.roots = roots
+        self.state = self.snapshot()
+
+    def snapshot(self):
+        state = {}
+        for root in self.roots:
+            for dirpath, _, filenames in os.walk(root):
+                for filename in filenames:
+                    path = pathlib.Path(dirpath) / filename
+                    try:
+                        st = path.stat()
+                    except OSError:
+                        continue
+                    state[path] = (st.st_size, st.st_mtime_ns)
+        return state
+
+    def wait(self, timeout=None):
+        """Poll until something changes or timeout passes; returns the changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            time.sleep(WATCH_POLL if deadline is None
+                       else max(0.0, min(WATCH_POLL, deadline - time.monotonic())))
+            state = self.snapshot()
+            changed = {path for path in state.keys() | self.state.keys()
+                       if state.get(path) != self.state.get(path)}
+            self.state = state
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+def make_watcher(roots, poll=False):
+    if not poll:
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), polling for changes every {WATCH_POLL:g}s")
+    return PollingWatcher(roots)
+
+def changed_addons(paths):
+    """Map changed file paths to the addon folders they belong to."""
+    addons = set()
+    for path in paths:
+        if WATCH_IGNORE.search(path.name):
+            continue
+        if path == REPO or REPO in path.parents:
+            addons.add(REPO)
+        elif ADDONS in path.parents:
+            addons.add(ADDONS / path.relative_to(ADDONS).parts[0])
+    return addons
+
+def watch(args, manifest, policy, jobs):
+    """
+    Rebuild addons as their sources change. Each burst of edits is
+    debounced, then only the touched addons are rezipped (with their
+    texture/image stages and deltas), and only their addons.xml entries
+    and changed index pages are regenerated.
+    """
+    watcher = make_watcher([REPO, ADDONS], args.poll)
+    fragments = {}
+    generate_addons_xml(fragments)
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    print(f"Watching {ADDONS.relative_to(ROOT)}/ for changes (Ctrl+C to stop)...")
+    try:
+        while True:
+            paths = watcher.wait()
+            first_change = time.perf_counter()
+            while True:
+                more = watcher.wait(WATCH_DEBOUNCE)
+                if not more:
+                    break
+                paths |= more
+            addon_paths = sorted(addon for addon in changed_addons(paths) if addon.is_dir())
+            if not addon_paths:
+                continue
+            started = time.perf_counter()
+            skins = [addon_path for addon_path in addon_paths if addon_path.name.startswith("skin.")]
+            overlays = prepare_overlays(skins, args, executor, BuildProfile())
+            results = build_addons(addon_paths, ZIPS, manifest, policy, False, executor, None,
+                                   overlays, not args.quiet)
+            publish_addon_deltas(results, manifest, policy, args.delta_versions, overlays)
+            prune_old_versions(results, args.keep_versions)
+            _, _, outputs = generate_addons_xml(fragments)
+            for path, checksums in outputs.items():
+                record_checksums(manifest, path, checksums)
+            write_checksum_index(manifest)
+            generate_html_index_pages(manifest.setdefault("listings", {}))
+            save_manifest(manifest)
+            now = time.perf_counter()
+            for addon_id, version, rebuilt in results:
+                state = "Rebuilt" if rebuilt else "No change to"
+                print(f"{state} {addon_id} {version} in {now - started:.2f}s "
+                      f"({now - first_change:.2f}s after the first edit)")
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+class BuildProfile:
+    """Wall time, CPU time and file/byte counts for each build phase."""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time a block; the yielded dict takes files/bytes_in/bytes_out counts."""
+        stats = self.phases.setdefault(
+            name, {"wall_s": 0.0, "cpu_s": 0.0, "files": 0, "bytes_in": 0, "bytes_out": 0})
+        wall, cpu = time.perf_counter(), self.cpu_seconds()
+        try:
+            yield stats
+        finally:
+            stats["wall_s"] += time.perf_counter() - wall
+            stats["cpu_s"] += self.cpu_seconds() - cpu
+
+    @staticmethod
+    def cpu_seconds():
+        """
+        CPU time of this process, its reaped children (os.times) and the
+        tasks pool workers ran for it. Pool workers are only reaped at
+        shutdown, so their time is counted per task through WORKER_CPU_S.
+        """
+        times = os.times()
+        return time.process_time() + times.children_user + times.children_system + WORKER_CPU_S
+
+    def as_dict(self, **meta):
+        phases = {}
+        for name, stats in self.phases.items():
+            wall = stats["wall_s"]
+            phases[name] = dict(
+                stats,
+                files_per_s=stats["files"] / wall if wall else 0.0,
+                mb_in_per_s=stats["bytes_in"] / wall / 1e6 if wall else 0.0,
+            )
+        total = {key: sum(p[key] for p in self.phases.values())
+                 for key in ("wall_s", "cpu_s", "files", "bytes_in", "bytes_out")}
+        return dict(meta, phases=phases, total=total)
+
+    def print_summary(self):
+        print("Build profile:")
+        print(f"  {'phase':<12} {'wall s':>8} {'cpu s':>8} {'files':>7} {'in KB':>10} {'out KB':>10} {'files/s':>9}")
+        for name, stats in self.as_dict()["phases"].items():
+            print(f"  {name:<12} {stats['wall_s']:>8.3f} {stats['cpu_s']:>8.3f} {stats['files']:>7} "
+                  f"{stats['bytes_in'] / 1024:>10.0f} {stats['bytes_out'] / 1024:>10.0f} "
+                  f"{stats['files_per_s']:>9.0f}")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def write_profile(profile, path, args, jobs):
+    data = profile.as_dict(
+        timestamp=datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        commit=git_commit(),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        jobs=jobs,
+        argv=args.argv,
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=1, sort_keys=True), encoding="utf-8")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build the Aurion Kodi repository into docs/.")
+    parser.add_argument("--force", action="store_true",
+                        help="rezip every addon even if the build manifest says it is unchanged")
+    parser.add_argument("--jobs", "-j", type=int, default=1, metavar="N",
+                        help="compress addons and large files on N processes (0 = all cores)")
+    parser.add_argument("--deflate-level", type=int, default=DEFLATE_LEVEL, choices=range(0, 10),
+                        metavar="0-9", help=f"zlib level for compressible files (default {DEFLATE_LEVEL})")
+    parser.add_argument("--store", action="append", default=[], metavar="EXT",
+                        help="also store files with this extension uncompressed (repeatable)")
+    parser.add_argument("--keep-timestamps", action="store_true",
+                        help="keep filesystem mtimes and modes instead of writing reproducible zips")
+    parser.add_argument("--delta-versions", type=int, default=DELTA_VERSIONS, metavar="N",
+                        help=f"publish delta bundles from the previous N releases of "
+                             f"{', '.join(DELTA_ADDONS)} (default {DELTA_VERSIONS}, 0 = none)")
+    parser.add_argument("--fetch-releases", nargs="?", const=PAGES_ZIPS_URL, metavar="URL",
+                        help=f"before building, download the file manifests of the releases published at URL "
+                             f"(default {PAGES_ZIPS_URL}) so deltas can be built from a clean checkout")
+    parser.add_argument("--keep-versions", type=int, default=KEEP_VERSIONS, metavar="N",
+                        help=f"keep the newest N releases of each addon in docs/zips and delete "
+                             f"older ones (default {KEEP_VERSIONS}, 0 = keep all)")
+    parser.add_argument("--pack-textures", action="store_true",
+                        help="pack skin themes/<name>/ images into media/<name>.xbt bundles")
+    parser.add_argument("--optimize-images", action="store_true",
+                        help=f"downscale and recompress images under skin {', '.join(IMAGE_DIRS)}/ "
+                             f"(needs Pillow)")
+    parser.add_argument("--max-image-size", metavar="WxH",
+                        help="largest image size to ship (default: the skin's default resolution)")
+    parser.add_argument("--image-quality", type=int, default=IMAGE_QUALITY, metavar="1-95",
+                        help=f"JPEG quality for optimized images (default {IMAGE_QUALITY})")
+    parser.add_argument("--minify-xml", action="store_true",
+                        help=f"ship skin {', '.join(XML_DIRS)}/ files without comments and indentation, "
+                             f"after checking they are well-formed")
+    parser.add_argument("--find-duplicates", action="store_true",
+                        help="report files shipped more than once across addons and write "
+                             f"{ASSET_INDEX.relative_to(ROOT)}")
+    parser.add_argument("--dedupe-assets", action="store_true",
+                        help=f"point skin XML at one copy of duplicated {'/'.join(DEDUPE_DIRS)} files "
+                             f"and leave the other copies out of the zip (implies --find-duplicates)")
+    parser.add_argument("--profile", nargs="?", const=str(PROFILE), metavar="JSON",
+                        help=f"print per-phase timings and write them as JSON "
+                             f"(default {PROFILE.relative_to(ROOT)})")
+    parser.add_argument("--quiet", "-q", action="store_true",
+                        help="don't print every file added to a zip")
+    parser.add_argument("--watch", action="store_true",
+                        help="after building, watch addons/ and rebuild addons as they change")
+    parser.add_argument("--poll", action="store_true",
+                        help="with --watch, poll file mtimes instead of using inotify")
+    args = parser.parse_args(argv)
+    args.argv = list(sys.argv[1:] if argv is None else argv)
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    jobs = args.jobs or os.cpu_count() or 1
+    profile = BuildProfile()
     print("Building Aurion Repository...")
     
     # Ensure zips directory exists
     ZIPS.mkdir(exist_ok=True)
+    manifest = load_manifest()
+    policy = make_policy(args.deflate_level, args.store, not args.keep_timestamps)
+    report = {}
     
-    # Build repository addon first
-    print("Building repository addon...")
-    zip_addon(REPO, ZIPS)
-    
-    # Build all other addons
-    print("Building addons...")
-    for addon in ADDONS.iterdir():
-        if addon.is_dir():
-            try:
-                addon_id, version = zip_addon(addon, ZIPS)
-                print(f"Built {addon_id} version {version}")
-            except Exception as e:
-                # Log and continue so addons.xml/MD5 still regenerate
-                print(f"Warning: failed to build {addon.name}: {e}")
+    # Repository addon first, then all other addons
+    addon_paths = [REPO] + sorted(addon for addon in ADDONS.iterdir() if addon.is_dir())
+    print(f"Building addons ({jobs} job{'s' if jobs != 1 else ''})...")
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    if args.optimize_images and Image is None:
+        print("Warning: --optimize-images needs Pillow (pip install Pillow), skipping")
+        args.optimize_images = False
+    try:
+        skins = [addon_path for addon_path in addon_paths if addon_path.name.startswith("skin.")]
+        overlays = prepare_overlays(skins, args, executor, profile)
+        with profile.phase("zip") as stats:
+            results = build_addons(addon_paths, ZIPS, manifest, policy, args.force, executor, report,
+                                   overlays, not args.quiet)
+            stats["files"] = sum(row["files"] for row in report.values())
+            stats["bytes_in"] = sum(row["in"] for row in report.values())
+            stats["bytes_out"] = sum(row["out"] for row in report.values())
+            stats["compress_cpu_s"] = sum(row["seconds"] for row in report.values())
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    for addon_id, version, rebuilt in results:
+        if rebuilt:
+            print(f"Built {addon_id} version {version}")
+        else:
+            print(f"Unchanged {addon_id} version {version}, reusing existing zip")
+    print_compression_report(report)
+    if args.find_duplicates or args.dedupe_assets:
+        with profile.phase("duplicates"):
+            report_duplicates(manifest, [addon_id for addon_id, _, _ in results])
+
+    # Per-file release manifests and delta bundles for large addons
+    with profile.phase("deltas"):
+        if args.fetch_releases and args.delta_versions > 0:
+            fetch_release_manifests(args.fetch_releases, DELTA_ADDONS, ZIPS, args.delta_versions)
+        publish_addon_deltas(results, manifest, policy, args.delta_versions, overlays)
+    prune_old_versions(results, args.keep_versions)
     
     # Generate addons.xml and MD5
     print("Generating addons.xml and MD5...")
-    generate_addons_xml()
+    with profile.phase("addons.xml") as stats:
+        stats["files"], stats["bytes_in"], outputs = generate_addons_xml()
+        stats["bytes_out"] = sum(checksums["size"] for checksums in outputs.values())
+        for path, checksums in outputs.items():
+            record_checksums(manifest, path, checksums)
+    with profile.phase("checksums") as stats:
+        stats["files"] = write_checksum_index(manifest)
     
     # Generate HTML indexes for HTTP browsing
     print("Generating HTML index pages...")
-    generate_html_index_pages()
+    with profile.phase("html") as stats:
+        stats["files"], stats["bytes_out"] = generate_html_index_pages(manifest.setdefault("listings", {}))
+    save_manifest(manifest)
+
+    if args.profile:
+        profile.print_summary()
+        write_profile(profile, pathlib.Path(args.profile), args, jobs)
+        print(f"Wrote build profile to {args.profile}")
     
     print("Build complete!")
+    if args.watch:
+        watch(args, manifest, policy, jobs)
 
 if __name__ == "__main__":
     main()
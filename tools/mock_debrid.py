@@ -0,0 +1,90 @@
+"""
+Local stand-in for the Real-Debrid REST API, for trying the plugin's
+debrid client offline. Point the hidden rd_api_url setting of
+plugin.video.aurion at http://127.0.0.1:<port>/rest/1.0 and set any
+rd_token.
+
+Only /torrents/instantAvailability/<hash>/<hash>/... is served. A hash
+counts as cached when its last hex digit is even (or when listed in
+--cached), and every request is logged so batching is easy to see.
+"""
+import json
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "/rest/1.0/torrents/instantAvailability/"
+
+
+def is_cached(infohash, cached):
+    if cached is not None:
+        return infohash in cached
+    return int(infohash[-1], 16) % 2 == 0
+
+
+def availability(hashes, cached):
+    """Build an instantAvailability response in Real-Debrid's shape."""
+    return {
+        h: {"rd": [{"1": {"filename": f"{h}.mkv", "filesize": 1 << 30}}]} if is_cached(h, cached) else []
+        for h in hashes
+    }
+
+
+def make_handler(args):
+    class Handler(BaseHTTPRequestHandler):
+        requests = 0
+
+        def do_GET(self):
+            Handler.requests += 1
+            if args.token and self.headers.get("Authorization") != f"Bearer {args.token}":
+                return self.reply(401, {"error": "bad_token", "error_code": 8})
+            if not self.path.startswith(PREFIX):
+                return self.reply(404, {"error": "unknown_ressource", "error_code": 7})
+            hashes = [h.lower() for h in self.path[len(PREFIX):].split("/") if h]
+            if args.latency:
+                time.sleep(args.latency)
+            print(f"request {Handler.requests}: {len(hashes)} hashes")
+            self.reply(200, availability(hashes, args.cached))
+
+        def reply(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake Real-Debrid instantAvailability API.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--token", default="", help="require this bearer token (default: accept any)")
+    parser.add_argument("--latency", type=float, default=0.2, metavar="SECONDS",
+                        help="delay each response, like a real round-trip (default 0.2)")
+    parser.add_argument("--cached", nargs="*", metavar="HASH",
+                        help="hashes to report as cached (default: those ending in an even digit)")
+    args = parser.parse_args(argv)
+    if args.cached is not None:
+        args.cached = {h.lower() for h in args.cached}
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args))
+    print(f"Mock Real-Debrid API on http://127.0.0.1:{args.port}/rest/1.0 (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
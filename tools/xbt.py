@@ -0,0 +1,311 @@
+"""
+Pure-Python texture bundle (.xbt) writer for skin themes.
+
+An XBT bundle, as written by Kodi's TexturePacker, is a header listing
+every texture and its frames followed by the frame data. Frames hold
+A8R8G8B8 pixels, LZO1X-compressed when that makes them smaller (LZO is
+the only packing Kodi's reader understands). Sources must be
+non-interlaced PNGs.
+"""
+import struct
+import zlib
+
+XBT_MAGIC = b"XBTF"
+XBT_VERSION = b"2"
+XBT_MAX_PATH = 256
+XB_FMT_A8R8G8B8 = 16
+XB_FMT_OPAQUE = 0x10000
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+LZO_M2_MAX_OFFSET = 0x0800
+LZO_M3_MAX_OFFSET = 0x4000
+LZO_M4_MAX_OFFSET = 0xBFFF
+LZO_MIN_MATCH = 4
+LZO_CHAIN = 16
+
+
+def read_png(data):
+    """Decode a PNG into (width, height, rgba_bytes)."""
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+    pos, idat, palette, trns, header = len(PNG_SIGNATURE), [], None, None, None
+    while pos + 8 <= len(data):
+        length, chunk_type = struct.unpack_from(">I4s", data, pos)
+        chunk = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if chunk_type == b"IHDR":
+            header = struct.unpack(">IIBBBBB", chunk)
+        elif chunk_type == b"PLTE":
+            palette = chunk
+        elif chunk_type == b"tRNS":
+            trns = chunk
+        elif chunk_type == b"IDAT":
+            idat.append(chunk)
+        elif chunk_type == b"IEND":
+            break
+    if header is None:
+        raise ValueError("PNG has no IHDR chunk")
+    width, height, depth, color, _, _, interlace = header
+    if interlace:
+        raise ValueError("interlaced PNGs are not supported")
+    if color not in PNG_CHANNELS:
+        raise ValueError(f"unsupported PNG color type {color}")
+
+    bits_per_pixel = PNG_CHANNELS[color] * depth
+    stride = (width * bits_per_pixel + 7) // 8
+    samples = unfilter(zlib.decompress(b"".join(idat)), stride, height,
+                       max(1, bits_per_pixel // 8))
+    return width, height, to_rgba(samples, width, height, color, depth, palette, trns)
+
+
+def unfilter(raw, stride, height, bpp):
+    """Undo PNG scanline filters, returning the rows concatenated."""
+    out = bytearray(stride * height)
+    prev = bytearray(stride)
+    pos = 0
+    for y in range(height):
+        kind = raw[pos]
+        line = bytearray(raw[pos + 1:pos + 1 + stride])
+        pos += 1 + stride
+        if kind == 1:
+            for i in range(bpp, stride):
+                line[i] = (line[i] + line[i - bpp]) & 0xFF
+        elif kind == 2:
+            line = bytearray((a + b) & 0xFF for a, b in zip(line, prev))
+        elif kind == 3:
+            for i in range(stride):
+                left = line[i - bpp] if i >= bpp else 0
+                line[i] = (line[i] + ((left + prev[i]) >> 1)) & 0xFF
+        elif kind == 4:
+            for i in range(stride):
+                a = line[i - bpp] if i >= bpp else 0
+                b = prev[i]
+                c = prev[i - bpp] if i >= bpp else 0
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                if pa <= pb and pa <= pc:
+                    pred = a
+                elif pb <= pc:
+                    pred = b
+                else:
+                    pred = c
+                line[i] = (line[i] + pred) & 0xFF
+        elif kind != 0:
+            raise ValueError(f"bad PNG filter type {kind}")
+        out[y * stride:(y + 1) * stride] = line
+        prev = line
+    return out
+
+
+def unpack_bits(samples, width, height, depth):
+    """Expand 1/2/4-bit samples to one byte per sample."""
+    stride = (width * depth + 7) // 8
+    mask = (1 << depth) - 1
+    out = bytearray()
+    for y in range(height):
+        row = samples[y * stride:(y + 1) * stride]
+        values = [(byte >> shift) & mask for byte in row for shift in range(8 - depth, -1, -depth)]
+        out += bytes(values[:width])
+    return out
+
+
+def to_rgba(samples, width, height, color, depth, palette, trns):
+    """Convert unfiltered PNG samples to 8-bit RGBA."""
+    count = width * height
+    scale = 1
+    if depth == 16:
+        samples = samples[0::2]
+    elif depth < 8:
+        samples = unpack_bits(samples, width, height, depth)
+        if color == 0:
+            scale = 255 // ((1 << depth) - 1)
+            samples = bytes(v * scale for v in samples)
+
+    rgba = bytearray(count * 4)
+    if color == 6:
+        rgba[:] = samples
+    elif color == 3:
+        if palette is None:
+            raise ValueError("palette PNG without PLTE chunk")
+        alphas = trns or b""
+        lut = [
+            palette[i * 3:i * 3 + 3] + bytes((alphas[i] if i < len(alphas) else 255,))
+            for i in range(len(palette) // 3)
+        ]
+        rgba[:] = b"".join(lut[i] for i in samples)
+    elif color == 4:
+        for channel in range(3):
+            rgba[channel::4] = samples[0::2]
+        rgba[3::4] = samples[1::2]
+    else:
+        channels = PNG_CHANNELS[color]
+        for channel in range(3):
+            rgba[channel::4] = samples[channel % channels::channels]
+        rgba[3::4] = b"\xff" * count
+        if trns:
+            # tRNS names one fully transparent color, 16 bits per channel
+            key = bytes(v * scale for v in (trns[0::2] if depth == 16 else trns[1::2]))
+            key = key * 3 if channels == 1 else key[:3]
+            for i in range(0, count * 4, 4):
+                if rgba[i:i + 3] == key:
+                    rgba[i + 3] = 0
+    return rgba
+
+
+def lzo_ext(out, remainder):
+    """Append an LZO length extension: a zero per 255, then the rest."""
+    while remainder > 255:
+        out.append(0)
+        remainder -= 255
+    out.append(remainder)
+
+
+def lzo_literals(out, data, start, end, last_match):
+    """
+    Append data[start:end] as literals. Runs of up to three literals after
+    a match are flagged in the low bits of that match's offset.
+    """
+    length = end - start
+    if not length:
+        return
+    if last_match is None and length < 4:
+        out.append(17 + length)
+    elif last_match is not None and length < 4:
+        out[last_match] |= length
+    elif length <= 18:
+        out.append(length - 3)
+    else:
+        out.append(0)
+        lzo_ext(out, length - 18)
+    out += data[start:end]
+
+
+def lzo_match(out, distance, length):
+    """Append an M2, M3 or M4 match; returns the index of the byte that
+    carries its trailing literal count."""
+    if length <= 8 and distance <= LZO_M2_MAX_OFFSET:
+        offset = distance - 1
+        out.append(((length - 1) << 5) | ((offset & 7) << 2))
+        out.append(offset >> 3)
+        return len(out) - 2
+    if distance <= LZO_M3_MAX_OFFSET:
+        if length - 2 <= 31:
+            out.append(32 | (length - 2))
+        else:
+            out.append(32)
+            lzo_ext(out, length - 2 - 31)
+        offset = distance - 1
+    else:
+        distance -= LZO_M3_MAX_OFFSET
+        high = (distance >> 11) & 8
+        if length - 2 <= 7:
+            out.append(16 | high | (length - 2))
+        else:
+            out.append(16 | high)
+            lzo_ext(out, length - 2 - 7)
+        offset = distance & 0x3FFF
+    out += bytes(((offset << 2) & 0xFF, offset >> 6))
+    return len(out) - 2
+
+
+def lzo1x_compress(data):
+    """
+    LZO1X compressor producing a stream lzo1x_decompress_safe accepts.
+    Searches the last LZO_CHAIN positions sharing a 4-byte prefix, with
+    one step of lazy matching; emits literal runs and M2/M3/M4 matches.
+    """
+    data = bytes(data)
+    out = bytearray()
+    chains = {}
+    size = len(data)
+
+    def longest(pos):
+        key = data[pos:pos + LZO_MIN_MATCH]
+        chain = chains.get(key)
+        best_length = best_distance = 0
+        for candidate in reversed(chain or ()):
+            distance = pos - candidate
+            if distance > LZO_M4_MAX_OFFSET:
+                break
+            length = LZO_MIN_MATCH
+            while (pos + length + 64 <= size
+                   and data[candidate + length:candidate + length + 64] == data[pos + length:pos + length + 64]):
+                length += 64
+            while pos + length < size and data[candidate + length] == data[pos + length]:
+                length += 1
+            if length > best_length:
+                best_length, best_distance = length, distance
+        if chain is None:
+            chains[key] = [pos]
+        else:
+            chain.append(pos)
+            if len(chain) > LZO_CHAIN:
+                del chain[0]
+        return best_length, best_distance
+
+    pos = literal_start = 0
+    last_match = None
+    while pos + LZO_MIN_MATCH <= size:
+        length, distance = longest(pos)
+        if not length:
+            pos += 1
+            continue
+        if pos + 1 + LZO_MIN_MATCH <= size:
+            next_length, next_distance = longest(pos + 1)
+            if next_length > length + 1:
+                pos, length, distance = pos + 1, next_length, next_distance
+        lzo_literals(out, data, literal_start, pos, last_match)
+        last_match = lzo_match(out, distance, length)
+        pos += length
+        literal_start = pos
+    lzo_literals(out, data, literal_start, size, last_match)
+    out += b"\x11\x00\x00"
+    return bytes(out)
+
+
+def encode_texture(png_data):
+    """
+    Turn PNG bytes into one XBT frame: (width, height, format,
+    unpacked_size, payload). The payload is LZO1X unless that doesn't
+    shrink the pixels, in which case it's stored raw.
+    """
+    width, height, rgba = read_png(png_data)
+    pixels = bytearray(rgba)
+    # A8R8G8B8 is little-endian ARGB, i.e. BGRA in memory
+    pixels[0::4], pixels[2::4] = rgba[2::4], rgba[0::4]
+    fmt = XB_FMT_A8R8G8B8
+    if not bytes(rgba[3::4]).strip(b"\xff"):
+        fmt |= XB_FMT_OPAQUE
+    packed = lzo1x_compress(pixels)
+    payload = packed if len(packed) < len(pixels) else bytes(pixels)
+    return width, height, fmt, len(pixels), payload
+
+
+def write_xbt(out_path, textures):
+    """
+    Write textures, a list of (path, width, height, format,
+    unpacked_size, payload), as an XBT bundle. Identical payloads are
+    stored once.
+    """
+    textures = sorted(textures, key=lambda t: t[0])
+    offset = len(XBT_MAGIC) + len(XBT_VERSION) + 4 + len(textures) * (XBT_MAX_PATH + 8 + 40)
+    header = bytearray(XBT_MAGIC + XBT_VERSION + struct.pack("<I", len(textures)))
+    blobs, offsets = [], {}
+    for path, width, height, fmt, unpacked_size, payload in textures:
+        name = path.lower().encode("utf-8")
+        if len(name) >= XBT_MAX_PATH:
+            raise ValueError(f"texture path too long for XBT: {path}")
+        if payload not in offsets:
+            offsets[payload] = offset
+            offset += len(payload)
+            blobs.append(payload)
+        header += name.ljust(XBT_MAX_PATH, b"\0")
+        header += struct.pack("<II", 0, 1)  # loop count, frame count
+        header += struct.pack("<IIIQQIQ", width, height, fmt, len(payload),
+                              unpacked_size, 0, offsets[payload])
+    with open(out_path, "wb") as f:
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)